@@ -0,0 +1,164 @@
+"""
+Autotuner of the convolution algorithm used by each conv layer of `dcnn.DCNN`
+
+For each point of a grid of (batch size, sentence length), every candidate algorithm is timed
+on the actual input of every conv layer and the fastest one is kept.
+This is run offline, by this script, and the result saved next to the model pickle.
+At serving time the result is only loaded, if there: a model without it keeps the default algorithms.
+
+Usage: python autotune.py --model_path [model path] [--force]
+"""
+import os, time, json
+import numpy as np
+
+from dcnn import CONV_ALGOS
+
+BATCH_SIZES = (1, 10, 100)
+LENGTHS = (5, 10, 20, 40, 80)
+
+def tuning_path(model_path):
+    """
+    >>> tuning_path("models/ks=20,8,,dr=0.5,0.5.pkl")
+    'models/ks=20,8,,dr=0.5,0.5.tuning.json'
+    """
+    return os.path.splitext(model_path)[0] + ".tuning.json"
+
+def candidate_algos(layer):
+    """
+    the algorithms applicable to the layer, GEMM being for filters of height 1 only
+    """
+    return [conv_algo
+            for conv_algo in CONV_ALGOS
+            if conv_algo != "gemm" or layer.W.shape[2] == 1]
+
+def time_conv(layer, x, conv_algo, repeat):
+    """
+    the best time(in seconds) of `repeat` convolutions by the given algorithm
+    """
+    layer.conv_algo = conv_algo
+
+    best = np.inf
+    for i in xrange(repeat):
+        start = time.time()
+        layer.conv(x)
+        best = min(best, time.time() - start)
+    return best
+
+def tune(model, batch_sizes = BATCH_SIZES, lengths = LENGTHS, repeat = 3):
+    """
+    model: dcnn.DCNN
+
+    Returns:
+    list of conv tables, one for each conv layer,
+    consisting of (batch size, input width, fastest algorithm)
+    """
+    conv_tables = [[] for l in model.c_layers]
+
+    saved = [(l.conv_algo, l.conv_table) for l in model.c_layers]
+    try:
+        for l in model.c_layers:
+            l.conv_table = None
+
+        vocab_size = model.e_layer.embeddings.shape[0]
+        for batch_size in batch_sizes:
+            for length in lengths:
+                x = np.asarray(np.random.randint(vocab_size, size = (batch_size, length)),
+                               dtype = np.int32)
+
+                output = model.e_layer.output(x)
+                for l, conv_table in zip(model.c_layers, conv_tables):
+                    timings = [(time_conv(l, output, conv_algo, repeat), conv_algo)
+                               for conv_algo in candidate_algos(l)]
+                    best_time, best_algo = min(timings)
+
+                    conv_table.append((batch_size, output.shape[3], best_algo))
+
+                    l.conv_algo = best_algo
+                    output = l.output(output)
+    finally:
+        for l, (conv_algo, conv_table) in zip(model.c_layers, saved):
+            l.conv_algo = conv_algo
+            l.conv_table = conv_table
+
+    return conv_tables
+
+def apply_tuning(model, conv_tables):
+    """
+    make the conv layers dispatch by the tuning result
+    """
+    assert len(conv_tables) == len(model.c_layers)
+    for l, conv_table in zip(model.c_layers, conv_tables):
+        l.conv_table = [tuple(entry) for entry in conv_table]
+
+    model.clear_plans()
+
+def save_tuning(conv_tables, path):
+    with open(path, "w") as f:
+        json.dump({"conv_tables": conv_tables}, f, indent = 1)
+
+def load_tuning(path):
+    with open(path, "r") as f:
+        return json.load(f)["conv_tables"]
+
+def load_saved_tuning(model, model_path):
+    """
+    Make the model dispatch by the tuning result saved next to it, if there and readable, 
+    the default algorithms being kept otherwise. Nothing is timed
+
+    Returns:
+    the conv tables, None if not loaded
+    """
+    path = tuning_path(model_path)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        conv_tables = load_tuning(path)
+    except (IOError, ValueError):
+        # unreadable, the default algorithms are kept
+        return None
+
+    apply_tuning(model, conv_tables)
+    return conv_tables
+
+def tune_and_save(model, model_path):
+    """
+    Tune the model, make it dispatch by the result and save the result next to it
+
+    Returns:
+    the conv tables
+    """
+    conv_tables = tune(model)
+    apply_tuning(model, conv_tables)
+    save_tuning(conv_tables, tuning_path(model_path))
+    return conv_tables
+
+if __name__ == "__main__":
+    import argparse, sys
+    from param_util import load_dcnn_model_params
+    from dcnn import DCNN
+
+    parser = argparse.ArgumentParser(description = "Convolution algorithm autotuner")
+    parser.add_argument("--model_path", type=str, required = True,
+                        help = "Path of model parameters"
+    )
+    parser.add_argument("--force", action = "store_true",
+                        help = "Re-time even if the tuning file exists"
+    )
+    args = parser.parse_args(sys.argv[1:])
+
+    model = DCNN(load_dcnn_model_params(args.model_path))
+
+    start = time.time()
+    conv_tables = (load_saved_tuning(model, args.model_path) if not args.force else None)
+    if conv_tables is None:
+        try:
+            conv_tables = tune_and_save(model, args.model_path)
+        except IOError as e:
+            sys.exit("%s could not be written: %s" %(tuning_path(args.model_path), e))
+    print "Tuning %s in %.2fs" %(tuning_path(args.model_path), time.time() - start)
+
+    for i, conv_table in enumerate(conv_tables):
+        print "Conv layer %d:" %(i + 1)
+        for batch_size, width, conv_algo in conv_table:
+            print "  batch size %4d, input width %3d: %s" %(batch_size, width, conv_algo)
@@ -0,0 +1,245 @@
+"""
+Benchmark of the numpy DCNN used for prediction
+"""
+import time
+import numpy as np
+from cPickle import load
+
+from param_util import load_dcnn_model_params
+from dcnn import (DCNN, EMBEDDING_STORAGES)
+
+_MODEL_PATH = "models/filter_widths=8,6,,batch_size=10,,ks=20,8,,fold=1,1,,conv_layer_n=2,,ebd_dm=48,,l2_regs=1e-06,1e-06,1e-06,0.0001,,dr=0.5,0.5,,nkerns=7,12.pkl"
+
+class AllocationCountingArray(np.ndarray):
+    """
+    Array type that counts the new arrays derived from it(by ufuncs, indexing, copies, etc),
+    views of existing memory excluded
+    """
+    n_arrays = 0
+    n_bytes = 0
+
+    def __array_finalize__(self, obj):
+        if obj is not None and self.ndim > 0 and not np.may_share_memory(self, obj):
+            AllocationCountingArray.n_arrays += 1
+            AllocationCountingArray.n_bytes += self.nbytes
+
+def count_allocations(f, x):
+    """
+    the number of arrays and bytes allocated by `f(x)`
+    """
+    AllocationCountingArray.n_arrays = 0
+    AllocationCountingArray.n_bytes = 0
+    f(x.view(AllocationCountingArray))
+    return AllocationCountingArray.n_arrays, AllocationCountingArray.n_bytes
+
+def unfused_fold_k_max_pool(layer, conv_out):
+    """
+    The folding, k-max pooling, bias and activation of `dcnn.ConvFoldingPoolLayer` before fusion
+    """
+    if layer.fold_flag:
+        fold_out = (conv_out[:, :, np.arange(0, conv_out.shape[2], 2)] +
+                    conv_out[:, :, np.arange(1, conv_out.shape[2], 2)]) / 2
+    else:
+        fold_out = conv_out
+
+    ind = np.argsort(fold_out, axis = 3)
+    sorted_ind = np.sort(ind[:,:,:, -layer.k:], axis = 3)
+    dim0, dim1, dim2, dim3 = sorted_ind.shape
+    indices_dim0 = np.arange(dim0).repeat(dim1 * dim2 * dim3)
+    indices_dim1 = np.transpose(np.arange(dim1).repeat(dim2 * dim3).reshape((dim1*dim2*dim3, 1)).repeat(dim0, axis=1)).flatten()
+    indices_dim2 = np.transpose(np.arange(dim2).repeat(dim3).reshape((dim2*dim3, 1)).repeat(dim0 * dim1, axis = 1)).flatten()
+    pool_out = fold_out[indices_dim0, indices_dim1, indices_dim2, sorted_ind.flatten()].reshape(sorted_ind.shape)
+
+    return np.tanh(pool_out + layer.b[np.newaxis, :, np.newaxis, np.newaxis])
+
+def report_layer_allocations(model, x):
+    """
+    print the arrays allocated after the convolution at each conv layer,
+    before fusion, after fusion and with the buffers of the execution plan
+    """
+    plan = model.plan(*x.shape)
+    output = model.e_layer.output(x)
+
+    for i, (l, layer_plan) in enumerate(zip(model.c_layers, plan.layer_plans)):
+        conv_out = l.conv(output)
+
+        n_before, bytes_before = count_allocations(lambda y: unfused_fold_k_max_pool(l, y),
+                                                   conv_out.copy())
+        n_after, bytes_after = count_allocations(l.fold_k_max_pool,
+                                                 conv_out.copy())
+        n_planned, bytes_planned = count_allocations(lambda y: l.fold_k_max_pool(y, layer_plan),
+                                                     conv_out.copy())
+
+        print "Conv layer %d: %d arrays(%.1f KB) before fusion, %d arrays(%.1f KB) after, %d arrays(%.1f KB) with plan" %(
+            i + 1,
+            n_before, bytes_before / 1024.,
+            n_after, bytes_after / 1024.,
+            n_planned, bytes_planned / 1024.
+        )
+
+        output = l.fold_k_max_pool(conv_out)
+
+def load_dev_test(corpus_path):
+    """
+    the dev and test sets, (x, y), of the preprocessed corpus(see `util.load_data`)
+    """
+    data = load(open(corpus_path))
+    return data[1], data[2]
+
+def p_y_given_x_in_batches(model, x, batch_size = 500):
+    return np.concatenate([model._p_y_given_x(x[i: i + batch_size])
+                           for i in xrange(0, x.shape[0], batch_size)])
+
+def report_dtype_drift(params, corpus_path):
+    """
+    print the dev/test errors of the float32 model against the float64 one,
+    and how far their probabilities are
+    """
+    model64 = DCNN(params, dtype = np.float64)
+    model32 = DCNN(params, dtype = np.float32)
+
+    for name, (x, y) in zip(("dev", "test"), load_dev_test(corpus_path)):
+        x, y = np.asarray(x, dtype = np.int32), np.asarray(y)
+        p64 = p_y_given_x_in_batches(model64, x)
+        p32 = p_y_given_x_in_batches(model32, x)
+
+        pred64, pred32 = np.argmax(p64, axis = 1), np.argmax(p32, axis = 1)
+        print "%s: error %.2f%%(float64) vs %.2f%%(float32), %d predictions differ, max probability drift %.2e" %(
+            name,
+            np.mean(pred64 != y) * 100, 
+            np.mean(pred32 != y) * 100,
+            np.sum(pred64 != pred32),
+            np.abs(p64 - p32).max()
+        )
+
+def report_embedding_storage(params, corpus_path = None):
+    """
+    print the memory of the embedding table for each storage, and the saving against float32,
+    with the dev/test error change if the corpus is given
+    """
+    full = DCNN(params, plan_cache_size = 0)
+    if corpus_path:
+        dev_test = [(np.asarray(x, dtype = np.int32), np.asarray(y))
+                    for x, y in load_dev_test(corpus_path)]
+        full_errors = [np.mean(np.argmax(p_y_given_x_in_batches(full, x), axis = 1) != y)
+                       for x, y in dev_test]
+
+    for storage in EMBEDDING_STORAGES[1:]:
+        model = DCNN(params, plan_cache_size = 0, embedding_storage = storage)
+        line = "Embedding in %s: %.1f KB, %.1f KB saved per worker" %(
+            storage, 
+            model.e_layer.nbytes / 1024.,
+            (full.e_layer.nbytes - model.e_layer.nbytes) / 1024.
+        )
+        
+        if corpus_path:
+            for name, (x, y), full_error in zip(("dev", "test"), dev_test, full_errors):
+                error = np.mean(np.argmax(p_y_given_x_in_batches(model, x), axis = 1) != y)
+                line += ", %s error %.2f%%(%+.2f%%)" %(name, error * 100, (error - full_error) * 100)
+
+        print line
+
+def time_forward(model, x, repeat, parallel = False):
+    """
+    the average time(in seconds) of the forward pass, 
+    split over the thread pool of the model if `parallel`
+    """
+    forward = model._p_y_given_x_parallel if parallel else model._p_y_given_x
+    start = time.time()
+    for i in xrange(repeat):
+        forward(x)
+    return (time.time() - start) / repeat
+
+def report_parallel_scaling(params, x, repeat, max_workers):
+    """
+    print the time of the forward pass and the speedup against one thread, 
+    for 1, 2, 4... up to `max_workers` threads
+    """
+    n_workers = 1
+    while True:
+        model = DCNN(params, n_workers = n_workers, min_shard_size = 1)
+        elapsed = time_forward(model, x, repeat, parallel = True)
+        if n_workers == 1:
+            serial = elapsed
+
+        print "Parallel forward pass(%d threads): %.2f ms, speedup %.2fx" %(
+            n_workers, elapsed * 1000, serial / elapsed
+        )
+        if n_workers >= max_workers:
+            break
+        n_workers = min(n_workers * 2, max_workers)
+
+_STARTUP_SCRIPT = """
+import sys, time
+start = time.time()
+import sentiment
+imported = time.time()
+numpy_imported = "numpy" in sys.modules
+sentiment.warm_up()
+print imported - start, time.time() - imported, numpy_imported
+"""
+
+def report_startup():
+    """
+    print the time of `import sentiment` and of `sentiment.warm_up` in a new interpreter, 
+    in the current directory
+    """
+    import subprocess, sys
+    output = subprocess.check_output([sys.executable, "-c", _STARTUP_SCRIPT])
+    import_time, warm_up_time, numpy_imported = output.split()
+    print "import sentiment: %.1f ms(numpy imported: %s), warm_up: %.1f ms" %(
+        float(import_time) * 1000, numpy_imported, float(warm_up_time) * 1000
+    )
+
+if __name__ == "__main__":
+    import argparse, sys, multiprocessing
+
+    parser = argparse.ArgumentParser(description = "Benchmark of the numpy DCNN")
+    parser.add_argument("--model_path", type=str, default = _MODEL_PATH,
+                        help = "Path of model parameters"
+    )
+    parser.add_argument("--batch_size", type=int, default = 100,
+                        help = "Number of sentences in the batch, 100 as for a hashtag request"
+    )
+    parser.add_argument("--length", type=int, default = 30,
+                        help = "Number of words in the sentences"
+    )
+    parser.add_argument("--repeat", type=int, default = 20,
+                        help = "Number of repetitions of the forward pass"
+    )
+    parser.add_argument("--n_workers", type=int, default = multiprocessing.cpu_count(),
+                        help = "Maximum number of threads of the parallel forward pass"
+    )
+    parser.add_argument("--corpus_path", type=str,
+                        help = "Path of preprocessed corpus, to report the accuracy on dev/test"
+    )
+    parser.add_argument("--startup", action = "store_true",
+                        help = "Report the import and warm-up time of the sentiment module, run from the project directory"
+    )
+    args = parser.parse_args(sys.argv[1:])
+
+    if args.startup:
+        report_startup()
+
+    params = load_dcnn_model_params(args.model_path)
+
+    x = np.asarray(
+        np.random.randint(params.embeddings.shape[0], size = (args.batch_size, args.length)),
+        dtype = np.int32
+    )
+
+    for dtype in (np.float64, np.float32):
+        model = DCNN(params, dtype = dtype)
+        print "Forward pass(batch size %d, length %d, %s): %.2f ms" %(
+            args.batch_size, args.length, np.dtype(dtype).name, 
+            time_forward(model, x, args.repeat) * 1000
+        )
+
+    report_layer_allocations(model, x)
+
+    report_parallel_scaling(params, x, args.repeat, args.n_workers)
+
+    report_embedding_storage(params, args.corpus_path)
+
+    if args.corpus_path:
+        report_dtype_drift(params, args.corpus_path)
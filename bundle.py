@@ -0,0 +1,267 @@
+"""
+Compiled model bundle: one file holding what the numpy DCNN needs for prediction,
+to be memory-mapped by the serving processes, which then start without unpickling and share the pages.
+
+Layout:
+- magic bytes and the header length(uint64, little endian)
+- a JSON header: the hyperparameters, the vocabulary, how the weights were prepared,
+  and the dtype, shape and offset of each array
+- the raw arrays, each starting on a page boundary
+
+The weights are prepared once when compiling:
+- the filters are stored flipped, as the convolution applies them,
+  so for filters of height 1 the GEMM filter matrix is a view of the mapped pages
+- optionally, the weights are scaled by (1 - dropout rate), the averaged model of dropout training
+- the embedding rows are reordered by decreasing token frequency,
+  so the rows gathered most often share a few pages,
+  and the vocabulary stored in the bundle follows the new order
+
+Usage: python bundle.py --model_path [model path] --corpus_path [corpus path] [--scale_dropout]
+"""
+import os, json, struct
+import numpy as np
+
+from param_util import (Params, load_dcnn_model_params)
+
+MAGIC = "DCNNBNDL"
+
+PAGE_SIZE = 4096
+
+VERSION = 1
+
+def bundle_path(model_path):
+    """
+    >>> bundle_path("models/ks=20,8,,dr=0.5,0.5.pkl")
+    'models/ks=20,8,,dr=0.5,0.5.bundle'
+    """
+    return os.path.splitext(model_path)[0] + ".bundle"
+
+def parse_dropout_rates(model_path):
+    """
+    the dropout rates given in the model file name
+
+    >>> parse_dropout_rates("models/filter_widths=8,6,,ks=20,8,,dr=0.5,0.3,,nkerns=7,12.pkl")
+    [0.5, 0.3]
+    """
+    for seg in os.path.basename(model_path).split(",,"):
+        if seg.startswith("dr="):
+            return map(float, seg[len("dr="):].split(","))
+    raise ValueError("no dropout rates in %s" %(model_path))
+
+def token_counts(x, vocab_size, padding_index = None):
+    """
+    the number of occurrences of each word index in the sentences, padding excluded
+
+    >>> token_counts(np.asarray([[1, 2, 2, 0], [2, 3, 0, 0]]), 5, padding_index = 0).tolist()
+    [0, 1, 3, 1, 0]
+    """
+    counts = np.bincount(np.asarray(x).ravel(), minlength = vocab_size)
+    if padding_index is not None:
+        counts[padding_index] = 0
+    return counts
+
+def frequency_order(counts):
+    """
+    the word indices by decreasing count, ties in index order
+
+    >>> frequency_order(np.asarray([0, 1, 3, 1, 0])).tolist()
+    [2, 1, 3, 0, 4]
+    """
+    return np.argsort(-np.asarray(counts), kind = "mergesort")
+
+def _align(offset):
+    return (offset + PAGE_SIZE - 1) // PAGE_SIZE * PAGE_SIZE
+
+def compile_model(params, word2index, path,
+                  counts = None,
+                  dropout_rates = None,
+                  dtype = np.float32):
+    """
+    Write the bundle of the model
+
+    params: the model parameters, as given by `param_util.load_dcnn_model_params`
+
+    word2index: dict
+       the vocabulary, word to row of `params.embeddings`
+
+    counts: numpy.ndarray, optional
+       the token frequency of each row, to reorder the embedding rows by
+
+    dropout_rates: list of float, optional
+       the dropout rates of the conv layers, as in training, the last one also used for the output layer.
+       If given, the weights are scaled by (1 - rate)
+
+    dtype: numpy.dtype
+       the dtype of the stored weights
+    """
+    vocab_size = params.embeddings.shape[0]
+
+    if counts is not None:
+        order = frequency_order(counts)
+    else:
+        order = np.arange(vocab_size)
+
+    # old row to new row
+    new_rows = np.empty(vocab_size, dtype = np.intp)
+    new_rows[order] = np.arange(vocab_size)
+
+    Ws, bs = params.W, params.b
+    if params.conv_layer_n == 1:
+        Ws, bs = [Ws], [bs]
+
+    logreg_W = params.logreg_W
+    if dropout_rates is not None:
+        assert len(dropout_rates) >= params.conv_layer_n, "%r" %(dropout_rates)
+        Ws = [W * (1 - rate) for W, rate in zip(Ws, dropout_rates)]
+        logreg_W = logreg_W * (1 - dropout_rates[-1])
+
+    arrays = [("embeddings", params.embeddings[order])]
+    for i, (W, b) in enumerate(zip(Ws, bs)):
+        arrays.append(("W_flipped%d" %(i), W[:, :, ::-1, ::-1]))
+        arrays.append(("b%d" %(i), b))
+    arrays.append(("logreg_W", logreg_W))
+    if hasattr(params, "logreg_V"):
+        # factored output layer(see `compress.py`)
+        arrays.append(("logreg_V", params.logreg_V))
+    arrays.append(("logreg_b", params.logreg_b))
+
+    arrays = [(name, np.ascontiguousarray(value, dtype = dtype))
+              for name, value in arrays]
+
+    words = [None] * vocab_size
+    for word, index in word2index.iteritems():
+        words[new_rows[index]] = word
+
+    header = {
+        "version": VERSION,
+        "hyperparameters": {
+            "conv_layer_n": params.conv_layer_n,
+            "ks": map(int, np.atleast_1d(params.ks)),
+            "fold": map(int, np.atleast_1d(params.fold)),
+            "filter_shapes": [list(W.shape) for W in Ws],
+        },
+        "filters_flipped": True,
+        "dropout_scaled": dropout_rates is not None,
+        "dropout_rates": dropout_rates,
+        "frequency_ordered": counts is not None,
+        "vocabulary": words,
+        "arrays": []
+    }
+
+    # the offsets depend on the header length, which depends on the offsets:
+    # lay out with the header length rounded up to pages until it fits
+    header_pages = 1
+    while True:
+        offset = _align(len(MAGIC) + 8) + header_pages * PAGE_SIZE
+        header["arrays"] = []
+        for name, value in arrays:
+            header["arrays"].append({"name": name,
+                                     "dtype": value.dtype.str,
+                                     "shape": list(value.shape),
+                                     "offset": offset})
+            offset = _align(offset + value.nbytes)
+
+        header_bytes = json.dumps(header)
+        if len(header_bytes) <= header_pages * PAGE_SIZE:
+            break
+        header_pages = (len(header_bytes) + PAGE_SIZE - 1) // PAGE_SIZE
+
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header_bytes)))
+        f.seek(_align(len(MAGIC) + 8))
+        f.write(header_bytes)
+        for (name, value), entry in zip(arrays, header["arrays"]):
+            f.seek(entry["offset"])
+            f.write(value.tostring())
+
+def read_header(path):
+    with open(path, "rb") as f:
+        assert f.read(len(MAGIC)) == MAGIC, "%s is not a model bundle" %(path)
+        header_len, = struct.unpack("<Q", f.read(8))
+        f.seek(_align(len(MAGIC) + 8))
+        header = json.loads(f.read(header_len))
+
+    assert header["version"] == VERSION, "bundle version %r != %r" %(header["version"], VERSION)
+    return header
+
+def load_bundle(path):
+    """
+    Map the bundle into memory, read-only
+
+    Returns:
+    - the model parameters, as for `dcnn.DCNN`, whose arrays are views of the mapped file.
+      For filters of height 1, `filters_mat` holds the GEMM filter matrices
+    - word2index, in the reordered rows
+    - the header
+    """
+    header = read_header(path)
+
+    arrays = dict((entry["name"], np.memmap(path,
+                                            dtype = np.dtype(entry["dtype"]),
+                                            mode = "r",
+                                            offset = entry["offset"],
+                                            shape = tuple(entry["shape"])))
+                  for entry in header["arrays"])
+
+    hyperparameters = header["hyperparameters"]
+
+    p = Params()
+    p.conv_layer_n = hyperparameters["conv_layer_n"]
+    p.ks = tuple(hyperparameters["ks"])
+    p.fold = tuple(hyperparameters["fold"])
+    p.embeddings = arrays["embeddings"]
+    p.logreg_W = arrays["logreg_W"]
+    p.logreg_b = arrays["logreg_b"]
+    if "logreg_V" in arrays:
+        p.logreg_V = arrays["logreg_V"]
+
+    p.W, p.b, p.filters_mat = [], [], []
+    for i in xrange(p.conv_layer_n):
+        W_flipped = arrays["W_flipped%d" %(i)]
+        p.W.append(W_flipped[:, :, ::-1, ::-1])
+        p.b.append(arrays["b%d" %(i)])
+        p.filters_mat.append(W_flipped.reshape((W_flipped.shape[0], -1))
+                             if W_flipped.shape[2] == 1 else None)
+
+    word2index = dict((word, index)
+                      for index, word in enumerate(header["vocabulary"])
+                      if word is not None)
+
+    return p, word2index, header
+
+if __name__ == "__main__":
+    import argparse, sys, time
+    from cPickle import load
+
+    parser = argparse.ArgumentParser(description = "Compile the model into a memory-mappable bundle")
+    parser.add_argument("--model_path", type=str, required = True,
+                        help = "Path of model parameters"
+    )
+    parser.add_argument("--corpus_path", type=str, default = "data/twitter.pkl",
+                        help = "Path of preprocessed corpus, for the vocabulary and the token frequencies of the training set"
+    )
+    parser.add_argument("--scale_dropout", action = "store_true",
+                        help = "Scale the weights by (1 - dropout rate), with the rates in the model file name"
+    )
+    parser.add_argument("--output", type=str,
+                        help = "Path of the bundle, next to the model by default"
+    )
+    args = parser.parse_args(sys.argv[1:])
+
+    params = load_dcnn_model_params(args.model_path)
+
+    data = load(open(args.corpus_path))
+    word2index = data[3]
+    counts = token_counts(data[0][0], params.embeddings.shape[0],
+                          padding_index = word2index.get(u"<PADDING>"))
+
+    path = args.output or bundle_path(args.model_path)
+    compile_model(params, word2index, path,
+                  counts = counts,
+                  dropout_rates = (parse_dropout_rates(args.model_path) if args.scale_dropout else None))
+    print "Bundle written to %s(%.1f MB)" %(path, os.path.getsize(path) / 1024. ** 2)
+
+    start = time.time()
+    load_bundle(path)
+    print "Bundle loaded in %.2f ms" %((time.time() - start) * 1000)
@@ -0,0 +1,187 @@
+"""
+Cascade inference: a bag-of-embeddings logistic regression scores every sentence first,
+the DCNN being run only on the sentences whose linear score falls in the uncertainty band.
+
+The linear model works on the mean of the word embeddings of the sentence, padding excluded,
+taken from the embedding layer of the DCNN, so it follows the vocabulary the DCNN is served with.
+
+Usage: python cascade.py --model_path [model path] --corpus_path [corpus path] [--bands 0.4,0.6 0.3,0.7]
+"""
+import os
+import numpy as np
+from cPickle import (load, dump)
+from scipy.optimize import fmin_l_bfgs_b
+
+from dcnn import LogisticRegression
+from numpy_impl import softmax
+
+def cascade_path(model_path):
+    """
+    >>> cascade_path("models/ks=20,8,,dr=0.5,0.5.pkl")
+    'models/ks=20,8,,dr=0.5,0.5.cascade.pkl'
+    """
+    return os.path.splitext(model_path)[0] + ".cascade.pkl"
+
+def bag_of_embeddings(e_layer, x, padding_index):
+    """
+    the mean embedding of each sentence, padding excluded
+
+    e_layer: dcnn.WordEmbeddingLayer
+
+    x: numpy.ndarray, the padded sentences in word indices
+
+    Returns:
+    numpy.ndarray, (number of sentences, embedding dimension)
+    """
+    mask = (x != padding_index)
+    lengths = np.maximum(mask.sum(axis = 1), 1)
+
+    # (sentences, 1, embedding dimension, words)
+    embedded = e_layer.output(x)
+    sums = (embedded[:, 0] * mask[:, np.newaxis, :]).sum(axis = 2)
+
+    return sums / lengths[:, np.newaxis].astype(sums.dtype)
+
+def train_linear(features, y, n_labels = 2, l2_reg = 1e-4, max_iter = 200):
+    """
+    Train the logistic regression on the features by L-BFGS
+
+    Returns:
+    dcnn.LogisticRegression
+    """
+    features = np.asarray(features, dtype = np.float64)
+    n, dim = features.shape
+    y_onehot = np.zeros((n, n_labels))
+    y_onehot[np.arange(n), y] = 1
+
+    def unpack(theta):
+        return theta[:dim * n_labels].reshape((dim, n_labels)), theta[dim * n_labels:]
+
+    def cost_and_grad(theta):
+        W, b = unpack(theta)
+        p = softmax(np.dot(features, W) + b)
+        cost = -np.mean(np.log(p[np.arange(n), y] + 1e-12)) + l2_reg * (W ** 2).sum()
+
+        delta = (p - y_onehot) / n
+        grad_W = np.dot(features.T, delta) + 2 * l2_reg * W
+        grad_b = delta.sum(axis = 0)
+        return cost, np.concatenate([grad_W.ravel(), grad_b])
+
+    theta, _, _ = fmin_l_bfgs_b(cost_and_grad, np.zeros(dim * n_labels + n_labels), maxiter = max_iter)
+
+    W, b = unpack(theta)
+    return LogisticRegression(W, b)
+
+class Cascade(object):
+    """
+    The linear model in front of the DCNN
+    """
+    def __init__(self, linear, model, padding_index, band = (0.3, 0.7)):
+        """
+        linear: dcnn.LogisticRegression, on the bag of embeddings
+
+        model: dcnn.DCNN
+
+        band: (low, high)
+           the sentences whose linear positive score is within it(bounds included) go to the DCNN
+        """
+        self.linear = linear
+        self.model = model
+        self.padding_index = padding_index
+        self.band = band
+
+        self.n_sentences = 0
+        self.n_routed = 0
+
+    def _p_y_given_x(self, x, forward = None):
+        """
+        the label probabilities, of the linear model for the clear-cut sentences
+        and of the DCNN for the others
+
+        forward: the DCNN forward pass, `model._p_y_given_x` by default
+        """
+        forward = forward or self.model._p_y_given_x
+
+        p_y_given_x, routed = self.route(x)
+        if len(routed) > 0:
+            p_y_given_x[routed] = forward(x[routed])
+
+        return p_y_given_x
+
+    def route(self, x):
+        """
+        the label probabilities of the linear model
+        and the positions of the sentences to run the DCNN on instead
+
+        x: numpy.ndarray, the sentences in word indices, padded or not
+        """
+        features = bag_of_embeddings(self.model.e_layer, x, self.padding_index)
+        p_y_given_x = self.linear._p_y_given_x(features).astype(self.model.dtype)
+
+        low, high = self.band
+        routed = np.flatnonzero((p_y_given_x[:, 1] >= low) & (p_y_given_x[:, 1] <= high))
+
+        self.n_sentences += x.shape[0]
+        self.n_routed += len(routed)
+        return p_y_given_x, routed
+
+    def routed_fraction(self):
+        return self.n_routed / float(max(self.n_sentences, 1))
+
+def save_linear(linear, path):
+    dump({"W": linear.W, "b": linear.b}, open(path, "wb"), protocol = 2)
+
+def load_linear(path):
+    data = load(open(path, "rb"))
+    return LogisticRegression(data["W"], data["b"])
+
+if __name__ == "__main__":
+    import argparse, sys, time
+    from param_util import load_dcnn_model_params
+    from dcnn import DCNN
+    from benchmark import p_y_given_x_in_batches
+
+    parser = argparse.ArgumentParser(description = "Train and evaluate the cascade")
+    parser.add_argument("--model_path", type=str, required = True,
+                        help = "Path of model parameters"
+    )
+    parser.add_argument("--corpus_path", type=str, default = "data/twitter.pkl",
+                        help = "Path of preprocessed corpus"
+    )
+    parser.add_argument("--bands", type=str, nargs = "+", default = ["0.45,0.55", "0.4,0.6", "0.3,0.7", "0.2,0.8"],
+                        help = "Uncertainty bands to evaluate, as low,high"
+    )
+    args = parser.parse_args(sys.argv[1:])
+
+    params = load_dcnn_model_params(args.model_path)
+    model = DCNN(params)
+
+    data = load(open(args.corpus_path))
+    padding_index = data[3][u"<PADDING>"]
+    (train_x, train_y), dev, test = [(np.asarray(x, dtype = np.int32), np.asarray(y))
+                                     for x, y in data[:3]]
+
+    features = np.concatenate([bag_of_embeddings(model.e_layer, train_x[i: i + 1000], padding_index)
+                               for i in xrange(0, train_x.shape[0], 1000)])
+    linear = train_linear(features, train_y)
+    save_linear(linear, cascade_path(args.model_path))
+    print "Linear model written to %s" %(cascade_path(args.model_path))
+
+    for name, (x, y) in (("dev", dev), ("test", test)):
+        start = time.time()
+        dcnn_pred = np.argmax(p_y_given_x_in_batches(model, x), axis = 1)
+        dcnn_time = time.time() - start
+        print "%s: DCNN only, accuracy %.2f%%, %.2f ms" %(name, np.mean(dcnn_pred == y) * 100, dcnn_time * 1000)
+
+        for band in args.bands:
+            cascade = Cascade(linear, model, padding_index, band = map(float, band.split(",")))
+
+            start = time.time()
+            pred = np.argmax(p_y_given_x_in_batches(cascade, x), axis = 1)
+            elapsed = time.time() - start
+
+            print "%s: band %s, %.1f%% routed to the DCNN, accuracy %.2f%%(%+.2f%%), %.2f ms" %(
+                name, band, cascade.routed_fraction() * 100,
+                np.mean(pred == y) * 100, (np.mean(pred == y) - np.mean(dcnn_pred == y)) * 100,
+                elapsed * 1000
+            )
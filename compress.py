@@ -0,0 +1,170 @@
+"""
+Compression of the DCNN weights for prediction:
+
+- magnitude pruning of whole conv filters: the filters of smallest L2 norm are removed from each conv layer,
+  together with their bias, the input maps of the next layer they feed, or the rows of `logreg_W` they feed
+- truncated SVD of `logreg_W` into (input number, rank) x (rank, output number),
+  run by `dcnn.LogisticRegression` as two products
+
+The compressed parameters are pickled as the model ones, `logreg_V` being the second factor,
+so `param_util.load_dcnn_model_params` loads them and `dcnn.DCNN` runs them.
+
+Usage: python compress.py --model_path [model path] --corpus_path [corpus path] [--prune 0 0.25 0.5] [--ranks 0 1]
+"""
+import os, copy
+import numpy as np
+from cPickle import dump
+
+def filter_norms(W):
+    """
+    the L2 norm of each filter
+
+    >>> filter_norms(np.asarray([[[[3., 4.]]], [[[1., 0.]]]])).tolist()
+    [5.0, 1.0]
+    """
+    return np.sqrt((W.reshape((W.shape[0], -1)) ** 2).sum(axis = 1))
+
+def prune_filters(params, i, keep):
+    """
+    Keep the given filters of the i-th conv layer
+
+    keep: sorted array of filter indices
+
+    Returns:
+    the pruned parameters, the others being shared with `params`
+    """
+    p = copy.copy(params)
+    p.W, p.b = list(params.W), list(params.b)
+
+    p.W[i] = params.W[i][keep]
+    p.b[i] = params.b[i][keep]
+
+    if i + 1 < params.conv_layer_n:
+        # the input maps of the next layer
+        p.W[i + 1] = params.W[i + 1][:, keep]
+    else:
+        # the last layer output is flattened feature map by feature map
+        n_maps = params.W[i].shape[0]
+        p.logreg_W = params.logreg_W.reshape((n_maps, -1, params.logreg_W.shape[1]))[keep].reshape(
+            (-1, params.logreg_W.shape[1]))
+
+    return p
+
+def prune_params(params, fraction):
+    """
+    remove the `fraction` of the filters of smallest norm in each conv layer
+    """
+    p = params
+    for i in xrange(params.conv_layer_n):
+        n = p.W[i].shape[0]
+        n_keep = max(1, n - int(round(n * fraction)))
+        keep = np.sort(np.argsort(-filter_norms(p.W[i]), kind = "mergesort")[:n_keep])
+        p = prune_filters(p, i, keep)
+    return p
+
+def factorize_logreg(params, rank):
+    """
+    truncated SVD of `logreg_W`, as `logreg_W` x `logreg_V`.
+    Nothing is done if the rank is no less than that of `logreg_W`
+    """
+    assert not hasattr(params, "logreg_V"), "already factored"
+    if rank >= min(params.logreg_W.shape):
+        return params
+
+    U, s, Vt = np.linalg.svd(params.logreg_W, full_matrices = False)
+
+    p = copy.copy(params)
+    p.logreg_W = U[:, :rank] * s[np.newaxis, :rank]
+    p.logreg_V = Vt[:rank]
+    return p
+
+def compress(params, prune_fraction = 0, rank = 0):
+    """
+    filter pruning then, if `rank` > 0, the factorization of the output layer
+    """
+    p = prune_params(params, prune_fraction) if prune_fraction > 0 else params
+    return factorize_logreg(p, rank) if rank > 0 else p
+
+def compressed_path(model_path, prune_fraction, rank):
+    """
+    the model path with the compression level added, the hyperparameters parsed from it being unchanged
+
+    >>> compressed_path("models/ks=20,8,,fold=1,1,,conv_layer_n=2.pkl", 0.25, 1)
+    'models/ks=20,8,,fold=1,1,,conv_layer_n=2,,prune=25,,rank=1.pkl'
+    """
+    return os.path.splitext(model_path)[0] + ",,prune=%d,,rank=%d.pkl" %(int(round(prune_fraction * 100)), rank)
+
+def save_params(params, path):
+    """
+    pickle the parameters as (name, value) pairs, in the order of the model pickles
+    """
+    data = [("embeddings", params.embeddings)]
+    for W, b in zip(params.W, params.b):
+        data += [("W", W), ("b", b)]
+    data.append(("logreg_W", params.logreg_W))
+    if hasattr(params, "logreg_V"):
+        data.append(("logreg_V", params.logreg_V))
+    data.append(("logreg_b", params.logreg_b))
+
+    dump(data, open(path, "w"))
+
+if __name__ == "__main__":
+    import argparse, sys
+    from param_util import load_dcnn_model_params
+    from dcnn import DCNN
+    from benchmark import (load_dev_test, p_y_given_x_in_batches, time_forward)
+
+    parser = argparse.ArgumentParser(description = "Compression of the DCNN weights")
+    parser.add_argument("--model_path", type=str, required = True,
+                        help = "Path of model parameters"
+    )
+    parser.add_argument("--corpus_path", type=str, default = "data/twitter.pkl",
+                        help = "Path of preprocessed corpus, for the dev/test errors"
+    )
+    parser.add_argument("--prune", type=float, nargs = "+", default = [0, 0.25, 0.5],
+                        help = "Fractions of the filters pruned in each conv layer"
+    )
+    parser.add_argument("--ranks", type=int, nargs = "+", default = [0, 1],
+                        help = "Ranks of the output layer factorization, 0 for none"
+    )
+    parser.add_argument("--batch_size", type=int, default = 100,
+                        help = "Batch size of the timing"
+    )
+    parser.add_argument("--length", type=int, default = 30,
+                        help = "Sentence length of the timing"
+    )
+    parser.add_argument("--save", action = "store_true",
+                        help = "Save the compressed parameters next to the model"
+    )
+    args = parser.parse_args(sys.argv[1:])
+
+    params = load_dcnn_model_params(args.model_path)
+    dev_test = [(np.asarray(x, dtype = np.int32), np.asarray(y))
+                for x, y in load_dev_test(args.corpus_path)]
+    x = np.asarray(np.random.randint(params.embeddings.shape[0], size = (args.batch_size, args.length)),
+                   dtype = np.int32)
+
+    def errors(model):
+        return [np.mean(np.argmax(p_y_given_x_in_batches(model, dx), axis = 1) != dy)
+                for dx, dy in dev_test]
+
+    base = DCNN(params)
+    base_time = time_forward(base, x, 20)
+    base_errors = errors(base)
+
+    for prune_fraction in args.prune:
+        for rank in args.ranks:
+            p = compress(params, prune_fraction, rank)
+            model = DCNN(p)
+            dev_error, test_error = errors(model)
+
+            print "prune %3d%%, rank %s, filters %s: speedup %.2fx, dev error %.2f%%(%+.2f%%), test error %.2f%%(%+.2f%%)" %(
+                prune_fraction * 100, (rank if rank > 0 else "full"),
+                ",".join(str(W.shape[0]) for W in p.W),
+                base_time / time_forward(model, x, 20),
+                dev_error * 100, (dev_error - base_errors[0]) * 100,
+                test_error * 100, (test_error - base_errors[1]) * 100
+            )
+
+            if args.save:
+                save_params(p, compressed_path(args.model_path, prune_fraction, rank))
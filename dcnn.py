@@ -1,36 +1,128 @@
 """
 Numpy version of DCNN, used for prediction, instead of training
 """
+import threading, weakref
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
+
 import numpy as np
-from numpy_impl import (conv2d, softmax)
+from numpy_impl import (conv2d, 
+                        conv2d_fft, fft_params, filters_fft, 
+                        conv1d_gemm, filters_matrix, 
+                        quantize_rows, softmax)
 
 _MODEL_PATH = "models/filter_widths=10,7,,batch_size=10,,ks=20,5,,fold=1,1,,conv_layer_n=2,,ebd_dm=48,,nkerns=6,12,,dr=0.5,0.5,,l2_regs=1e-06,0.0001,1e-05,1e-06.pkl"
 
+CONV_ALGOS = ("gemm", "fft", "scipy")
+
+EMBEDDING_STORAGES = (None, "float16", "int8")
+
+def closest_conv_algo(conv_table, batch_size, width):
+    """
+    The algorithm of the table entry closest to the given input size, in log scale
+
+    conv_table: list of (batch size, input width, algorithm)
+
+    >>> closest_conv_algo([(1, 10, "scipy"), (100, 10, "gemm"), (100, 80, "fft")], 50, 12)
+    'gemm'
+    """
+    def distance(entry):
+        return (np.log(float(entry[0]) / batch_size) ** 2 + 
+                np.log(float(entry[1]) / width) ** 2)
+    
+    return min(conv_table, key = distance)[2]
+
 class WordEmbeddingLayer(object):
     """
     Layer that takes input vectors, output the sentence matrix
     """
     def __init__(self, 
-                 embeddings):
+                 embeddings,
+                 storage = None):
         """
         embeddings: numpy.ndarray
                     Embedding, (vocab size, embedding dimension)
+
+        storage: None, "float16" or "int8"
+                 how the table is kept: as given, 
+                 in float16, or in int8 with a scale per row(see `numpy_impl.quantize_rows`).
+                 Only the gathered rows are converted back, to the dtype of `embeddings`
         """  
         assert embeddings.ndim == 2, "Should be have 2 dimensions"
-        self.embeddings = embeddings
+        assert storage in EMBEDDING_STORAGES, storage
+        
+        # the dtype of the output
+        self.dtype = embeddings.dtype
+        self.storage = storage
+        self.scales = None
+
+        if storage == "int8":
+            embeddings, self.scales = quantize_rows(embeddings, dtype = self.dtype)
+        elif storage == "float16":
+            embeddings = embeddings.astype(np.float16)
+
+        self.embeddings = np.ascontiguousarray(embeddings)
+
+        # the flattened embedding table and the offsets of each embedding dimension in it,
+        # so that one `take` gathers the whole batch
+        self._flat_embeddings = self.embeddings.reshape(-1)
+        self._dim_offsets = np.arange(self.embeddings.shape[1], dtype = np.intp)[:, np.newaxis]
 
-    def output(self, x):
+    @property
+    def nbytes(self):
+        """
+        the memory taken by the table, scales included
+        """
+        return self.embeddings.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def output(self, x, out = None, flat_index = None, gathered = None):
         """
         x: numpy.ndarray
            the input sentences consiting of word indices (number of instances, sentence word number)
+
+        out: numpy.ndarray, optional
+           C-contiguous buffer to write the result into, 
+           (number of instances, 1, embedding dimension, sentence word number)
+
+        flat_index: numpy.ndarray, optional
+           intp buffer for the gather indices, (number of instances, embedding dimension, sentence word number)
+
+        gathered: numpy.ndarray, optional
+           buffer for the gathered rows before conversion, of the same shape as `flat_index`, 
+           used when the table is stored in another dtype
+
+        Returns:
+        4D numpy.ndarray, (number of instances, 1, embedding dimension, sentence word number), C-contiguous
         """
-        sent_matrices = np.array(
-            map(lambda sent: self.embeddings[sent], 
-                x)
-        )
+        embed_dm = self.embeddings.shape[1]
+        shape = (x.shape[0], 1, embed_dm, x.shape[1])
         
-        # equivalent to dimshuffle(0, 'x', 2, 1) in Theano
-        return sent_matrices.swapaxes(1,2)[:,None,:,:]
+        if out is None:
+            out = np.empty(shape, dtype = self.dtype)
+        else:
+            assert out.shape == shape, "%r != %r" %(out.shape, shape)
+            assert out.flags.c_contiguous
+            
+        # equivalent to embeddings[x].dimshuffle(0, 'x', 2, 1) in Theano:
+        # out[i, 0, d, j] = embeddings[x[i, j], d]
+        # the row offsets are computed per word, then broadcast over the dimensions in one pass
+        if flat_index is None:
+            flat_index = np.empty(shape[:1] + shape[2:], dtype = np.intp)
+        np.add((x.astype(np.intp) * embed_dm)[:, np.newaxis, :], self._dim_offsets, out = flat_index)
+
+        if self.storage is None:
+            self._flat_embeddings.take(flat_index, out = out.reshape(flat_index.shape))
+            return out
+
+        # dequantize the gathered rows only
+        gathered = self._flat_embeddings.take(flat_index, out = gathered)
+        if self.scales is not None:
+            np.multiply(gathered, self.scales.take(x)[:, np.newaxis, :], 
+                        out = out.reshape(flat_index.shape))
+        else:
+            np.copyto(out.reshape(flat_index.shape), gathered)
+
+        return out
 
 class ConvFoldingPoolLayer(object):
     """
@@ -40,7 +132,9 @@ class ConvFoldingPoolLayer(object):
                  k,
                  fold,
                  W,
-                 b):
+                 b,
+                 conv_algo = None,
+                 filters_mat = None):
         """
         k: int
            the k value in the max-pooling layer
@@ -55,65 +149,274 @@ class ConvFoldingPoolLayer(object):
         b: numpy.ndarray,
            the filter bias, 
            dimension: (number of filters, )
+
+        conv_algo: str, "gemm", "fft" or "scipy"
+           the convolution algorithm.
+           By default, "gemm" for filters of height 1 and "fft" otherwise
+
+        filters_mat: numpy.ndarray, optional
+           the GEMM filter matrix as given by `filters_matrix`, if already at hand(e.g, from a model bundle)
         """
         self.fold_flag = fold
         self.W = W
         self.b = b
         self.k = k
 
-    def fold(self, x):
+        if conv_algo is None:
+            conv_algo = ("gemm" if W.shape[2] == 1 else "fft")
+        assert conv_algo in CONV_ALGOS
+        self.conv_algo = conv_algo
+
+        # list of (batch size, input width, algorithm) measured by `autotune`,
+        # overriding `conv_algo` if given
+        self.conv_table = None
+
+        # filter spectrums, by FFT size
+        self._filters_freq = {}
+        
+        # flipped and flattened filters, for `conv1d_gemm`
+        self._filters_mat = filters_mat
+
+    def select_conv_algo(self, batch_size, width):
+        """
+        the algorithm of the closest entry in `conv_table` if any, otherwise `conv_algo`
         """
+        if self.conv_table:
+            return closest_conv_algo(self.conv_table, batch_size, width)
+        else:
+            return self.conv_algo
+
+    def conv(self, x, plan = None):
+        """
+        `full` convolution of the input with the filters
+
+        For "gemm", the flattened filter matrix is reused across calls. 
+        For "fft", the filter spectrum is reused for inputs of the same FFT size
+        
+        x: numpy.ndarray
+           the input, 4d array
+
+        plan: LayerPlan, optional
+           the buffers to work in
+        """
+        conv_algo = self.select_conv_algo(x.shape[0], x.shape[3])
+
+        if conv_algo == "scipy":
+            return conv2d(x, self.W, mode = "full")
+        
+        if conv_algo == "gemm":
+            if self._filters_mat is None:
+                self._filters_mat = filters_matrix(self.W)
+
+            if plan is not None and plan.conv_algo == "gemm":
+                return conv1d_gemm(x, self.W, 
+                                   mode = "full",
+                                   filters_mat = self._filters_mat,
+                                   padded = plan.padded,
+                                   unrolled = plan.unrolled,
+                                   out = plan.conv_out)
+            else:
+                return conv1d_gemm(x, self.W, 
+                                   mode = "full",
+                                   filters_mat = self._filters_mat)
+
+        axes, fft_shape = fft_params(x.shape, self.W.shape)
+        
+        filters_freq = self._filters_freq.get(fft_shape)
+        if filters_freq is None:
+            filters_freq = filters_fft(self.W, axes, fft_shape)
+            self._filters_freq[fft_shape] = filters_freq
+            
+        return conv2d_fft(x, self.W, 
+                          mode = "full",
+                          filters_freq = filters_freq)
+
+    def fold(self, x, in_place = False):
+        """
+        sum up every two adjacent rows and average them, 
+        through a strided view of the input
+
         x: np.ndarray
            the input, 4d array
+
+        in_place: bool
+           write the result into the even rows of `x` and return a view of them
         """
-        return (x[:, :, np.arange(0, x.shape[2], 2)] + 
-                x[:, :, np.arange(1, x.shape[2], 2)]) / 2
+        pairs = x.reshape(x.shape[:2] + (x.shape[2] // 2, 2, x.shape[3]))
         
-    def k_max_pool(self, x, k):
+        if in_place:
+            fold_out = pairs[:, :, :, 0]
+            np.add(fold_out, pairs[:, :, :, 1], out = fold_out)
+            fold_out /= 2
+            return fold_out
+        else:
+            return (pairs[:, :, :, 0] + pairs[:, :, :, 1]) / 2
+        
+    def k_max_pool(self, x, k, plan = None):
         """
         perform k-max pool on the input along the rows
 
+        The k-th largest value of each row is found by partial selection,
+        the values no less than it are then gathered in their original order,
+        so the cost is linear in the row length.
+        Among values equal to the k-th largest one, the right-most ones are kept, 
+        as taking the tail of a stable argsort would.
+
         x: numpy.ndarray
            the input, 4d array
 
-        k: theano.tensor.iscalar
+        k: int
             the k parameter
 
+        plan: LayerPlan, optional
+           the buffers to work in, with `x` being `plan.fold_out`
+
         Returns: 
         4D numpy.ndarray
         """
-        ind = np.argsort(x, axis = 3)
+        if plan is not None:
+            return self._k_max_pool_into(x, k, plan)
 
-        sorted_ind = np.sort(ind[:,:,:, -k:], axis = 3)
+        width = x.shape[3]
+        if k >= width:
+            return x.copy()
         
-        dim0, dim1, dim2, dim3 = sorted_ind.shape
+        threshold = np.partition(x, width - k, axis = 3)[:, :, :, width - k, np.newaxis]
+
+        selected = (x > threshold)
+        ties = (x == threshold)
+
+        n_missing = k - selected.sum(axis = 3)
+
+        if (ties.sum(axis = 3) == n_missing).all():
+            selected |= ties
+        else:
+            # number of ties at or after each position
+            ties_to_right = np.cumsum(ties[:, :, :, ::-1], axis = 3)[:, :, :, ::-1]
+            selected |= (ties & (ties_to_right <= n_missing[:, :, :, np.newaxis]))
+
+        return x[selected].reshape(x.shape[:3] + (k, ))
+
+    def _k_max_pool_into(self, x, k, plan):
+        """
+        `k_max_pool` without large allocations, writing into `plan.pool_out`:
+        the rank of each kept value in its row plus the precomputed row offsets gives its position in the output,
+        while the other values go to a trailing slot of the output buffer
+        """
+        width = x.shape[3]
+        if k >= width:
+            np.copyto(plan.pool_out, x)
+            return plan.pool_out
         
-        indices_dim0 = np.arange(dim0).repeat(dim1 * dim2 * dim3)
-        indices_dim1 = np.transpose(np.arange(dim1).repeat(dim2 * dim3).reshape((dim1*dim2*dim3, 1)).repeat(dim0, axis=1)).flatten()
-        indices_dim2 = np.transpose(np.arange(dim2).repeat(dim3).reshape((dim2*dim3, 1)).repeat(dim0 * dim1, axis = 1)).flatten()
+        partitioned = plan.partitioned
+        np.copyto(partitioned, x)
+        partitioned.partition(width - k, axis = 3)
+        threshold = partitioned[:, :, :, width - k, np.newaxis]
+
+        selected, ties = plan.selected, plan.ties
+        np.greater(x, threshold, out = selected)
+        np.equal(x, threshold, out = ties)
+        
+        n_missing = k - selected.sum(axis = 3)
+
+        if (ties.sum(axis = 3) == n_missing).all():
+            selected |= ties
+        else:
+            ties_to_right = np.cumsum(ties[:, :, :, ::-1], axis = 3)[:, :, :, ::-1]
+            selected |= (ties & (ties_to_right <= n_missing[:, :, :, np.newaxis]))
+        
+        positions = plan.positions
+        np.cumsum(selected, axis = 3, out = positions)
+        positions += plan.row_offsets
+        np.copyto(positions, plan.pool_out_flat.size - 1, 
+                  where = np.logical_not(selected, out = ties))
+
+        plan.pool_out_flat.put(positions, x)
+        
+        return plan.pool_out
+        
+    def fold_k_max_pool(self, conv_out, plan = None):
+        """
+        folding, k-max pooling, bias and activation fused on the convolution output.
+        
+        Folding happens in place and so do the bias and the activation on the pooled array,
+        so the pooled array is the only output allocation
+
+        conv_out: numpy.ndarray
+           the convolution output, 4d array, overwritten by folding
+
+        plan: LayerPlan, optional
+           the buffers to work in, in which case nothing is allocated
+        """
+        if plan is not None:
+            # folded into a contiguous buffer, to be gathered from by `_k_max_pool_into`
+            if self.fold_flag:
+                pairs = conv_out.reshape(plan.fold_shape[:3] + (2, plan.fold_shape[3]))
+                fold_out = np.add(pairs[:, :, :, 0], pairs[:, :, :, 1], out = plan.fold_out)
+                fold_out /= 2
+            else:
+                fold_out = plan.fold_out
+                np.copyto(fold_out, conv_out)
+        elif self.fold_flag:
+            fold_out = self.fold(conv_out, in_place = True)
+        else:
+            fold_out = conv_out
+
+        pool_out = self.k_max_pool(fold_out, self.k, plan)
         
-        return x[indices_dim0, indices_dim1, indices_dim2, sorted_ind.flatten()].reshape(sorted_ind.shape)
+        pool_out += self.b[np.newaxis, :, np.newaxis, np.newaxis]
         
-    def output(self, x):
+        return np.tanh(pool_out, out = pool_out)
+
+    def output(self, x, plan = None):
         # non-linear transform of the convolution output
-        conv_out = conv2d(x, 
-                          self.W, 
-                          mode = "full")                     
+        return self.fold_k_max_pool(self.conv(x, plan), plan)
+
+    def output_packed(self, x, widths):
+        """
+        the output for sentences packed side by side along the word axis.
         
+        They are spaced by zero gaps of (filter width - 1) columns, 
+        so that the `full` convolution of each sentence occupies its own columns of the packed convolution output.
+        Folding is done on the whole, k-max pooling sentence by sentence.
+
+        x: numpy.ndarray
+           the input, 4d array, (1, number of input feature maps, rows, sum of `widths`)
+
+        widths: numpy.ndarray
+           the number of columns of each sentence
+
+        Returns: 
+        the packed output and the number of columns of each sentence in it
+        """
+        gap = self.W.shape[3] - 1
+        
+        # sentence i is shifted by i gaps
+        columns = np.arange(x.shape[3]) + np.repeat(np.arange(len(widths)) * gap, widths)
+        packed = np.zeros(x.shape[:3] + (x.shape[3] + gap * (len(widths) - 1), ), 
+                          dtype = x.dtype)
+        packed[:, :, :, columns] = x
+        
+        conv_out = self.conv(packed)
+
         if self.fold_flag:
-            # fold
-            fold_out = self.fold(conv_out)
+            fold_out = self.fold(conv_out, in_place = True)
         else:
             fold_out = conv_out
 
-        # k-max pool        
-        pool_out = (self.k_max_pool(fold_out, self.k) + 
-                    self.b[np.newaxis, :, np.newaxis, np.newaxis])
+        conv_widths = widths + gap
+        offsets = np.concatenate([[0], np.cumsum(conv_widths)])
         
-        return np.tanh(pool_out)
+        pool_out = np.concatenate([self.k_max_pool(fold_out[:, :, :, start: end], self.k)
+                                   for start, end in zip(offsets[:-1], offsets[1:])],
+                                  axis = 3)
+        
+        pool_out += self.b[np.newaxis, :, np.newaxis, np.newaxis]
+        
+        return np.tanh(pool_out, out = pool_out), np.minimum(conv_widths, self.k)
 
 class LogisticRegression(object):
-    def __init__(self, W, b):
+    def __init__(self, W, b, V = None):
         """ Initialize the parameters of the logistic regression
 
         :type input: theano.tensor.TensorType
@@ -125,16 +428,23 @@ class LogisticRegression(object):
         :type b: numpy.ndarray
         :param b:
 n
+        :type V: numpy.ndarray
+        :param V: (rank, output/label number), optional.
+                  If given, the weight matrix is factored as W x V, W being (input number, rank)
         """
-        assert W.shape[1] == b.shape[0]
+        assert (V if V is not None else W).shape[1] == b.shape[0]
         assert W.ndim == 2
         assert b.ndim == 1
 
         self.W = W
         self.b = b
+        self.V = V
 
     def _p_y_given_x(self, x):
-        return softmax(np.dot(x, self.W) + self.b[np.newaxis, :])
+        h = np.dot(x, self.W)
+        if self.V is not None:
+            h = np.dot(h, self.V)
+        return softmax(h + self.b[np.newaxis, :])
 
     def nnl(self, x, y):
         """
@@ -165,28 +475,257 @@ n
         p_y_given_x = self._p_y_given_x(x)
         return np.argmax(p_y_given_x, axis = 1)
         
+class LayerPlan(object):
+    """
+    Shapes, scratch buffers and gather indices of a conv layer for one input shape
+    """
+    def __init__(self, layer, input_shape, dtype):
+        """
+        layer: ConvFoldingPoolLayer
+
+        input_shape: tuple of length 4
+           (batch size, number of input feature maps, rows, words)
+
+        dtype: numpy.dtype
+           the dtype of the buffers
+        """
+        batch_size, input_feature_n, rows, cols = input_shape
+        output_feature_n, _, filter_h, filter_w = layer.W.shape
+        conv_rows, conv_cols = rows + filter_h - 1, cols + filter_w - 1
+
+        self.conv_algo = layer.select_conv_algo(batch_size, cols)
+        if self.conv_algo == "gemm":
+            # the padding columns are never written, thus stay zero
+            self.padded = np.zeros((batch_size, input_feature_n, rows, cols + 2 * (filter_w - 1)), 
+                                   dtype = dtype)
+            self.unrolled = np.empty((input_feature_n * filter_w, batch_size * rows * conv_cols), 
+                                     dtype = dtype)
+            self.conv_out = np.empty((output_feature_n, batch_size * rows * conv_cols), 
+                                     dtype = dtype)
+        
+        self.fold_shape = (batch_size, output_feature_n, 
+                           (conv_rows // 2 if layer.fold_flag else conv_rows), 
+                           conv_cols)
+        self.fold_out = np.empty(self.fold_shape, dtype = dtype)
+        
+        k = min(layer.k, conv_cols)
+        self.output_shape = self.fold_shape[:3] + (k, )
+
+        # with a trailing slot for the values not kept by k-max pooling
+        self.pool_out_flat = np.empty(int(np.prod(self.output_shape)) + 1, dtype = dtype)
+        self.pool_out = self.pool_out_flat[:-1].reshape(self.output_shape)
+
+        if k < conv_cols:
+            self.partitioned = np.empty(self.fold_shape, dtype = dtype)
+            self.selected = np.empty(self.fold_shape, dtype = np.bool_)
+            self.ties = np.empty(self.fold_shape, dtype = np.bool_)
+            self.positions = np.empty(self.fold_shape, dtype = np.intp)
+            
+            # the output position just before the first value of each row
+            n_rows = int(np.prod(self.fold_shape[:3]))
+            self.row_offsets = (np.arange(n_rows, dtype = np.intp) * k - 1).reshape(self.fold_shape[:3] + (1, ))
+
+    @property
+    def nbytes(self):
+        arrays = [getattr(self, name, None)
+                  for name in ("padded", "unrolled", "conv_out", "fold_out", "pool_out_flat",
+                               "partitioned", "selected", "ties", "positions", "row_offsets")]
+        return sum(a.nbytes for a in arrays if a is not None)
+
+class ExecutionPlan(object):
+    """
+    What a forward pass of DCNN needs for inputs of one (batch size, length):
+    the output shapes, buffers and gather indices of all layers, 
+    so that repeated calls with the same shape make no large allocation.
+
+    A plan is used by one thread at a time.
+    """
+    def __init__(self, model, batch_size, length):
+        """
+        model: DCNN
+        """
+        e_layer = model.e_layer
+        embed_dm = e_layer.embeddings.shape[1]
+        dtype = model.dtype
+
+        self.embedding_out = np.empty((batch_size, 1, embed_dm, length), 
+                                      dtype = e_layer.dtype)
+        self.flat_index = np.empty((batch_size, embed_dm, length), 
+                                   dtype = np.intp)
+        
+        if e_layer.storage is not None:
+            self.gathered = np.empty(self.flat_index.shape, dtype = e_layer.embeddings.dtype)
+        else:
+            self.gathered = None
+
+        self.layer_plans = []
+        input_shape = self.embedding_out.shape
+        for l in model.c_layers:
+            layer_plan = LayerPlan(l, input_shape, dtype)
+            self.layer_plans.append(layer_plan)
+            input_shape = layer_plan.output_shape
+
+        self.nbytes = (self.embedding_out.nbytes + self.flat_index.nbytes + 
+                       (self.gathered.nbytes if self.gathered is not None else 0) + 
+                       sum(layer_plan.nbytes for layer_plan in self.layer_plans))
+
+class _PlanCache(object):
+    """
+    The execution plans of one thread by input shape, least recently used first
+    """
+    def __init__(self, generation):
+        self.plans = OrderedDict()
+        self.nbytes = 0
+        self.generation = generation
+
 class DCNN(object):
-    def __init__(self, params):
-        self.e_layer = WordEmbeddingLayer(embeddings = params.embeddings)
+    def __init__(self, params, plan_cache_size = 8, dtype = np.float32, 
+                 n_workers = 1, min_shard_size = 16, embedding_storage = None, 
+                 plan_cache_bytes = None):
+        """
+        params: the model parameters, as given by `param_util.load_dcnn_model_params` 
+           or `bundle.load_bundle`
+
+        plan_cache_size: int
+           the number of execution plans(by input shape) each thread keeps, 0 to not use plans
+
+        plan_cache_bytes: int
+           the bytes the execution plans kept by all threads may take together, None for no bound.
+           A plan that does not fit is used once and dropped
+
+        dtype: numpy.dtype
+           the dtype of the weights and thus of all the intermediate results. 
+           The weights are cast once here, whatever dtype they were pickled with
+
+        n_workers: int
+           the number of threads `_p_y_given_x_parallel` splits a batch over
+
+        min_shard_size: int
+           the least number of sentences a thread is given, below which sharding costs more than it saves
+
+        embedding_storage: None, "float16" or "int8"
+           the storage of the embedding table(see `WordEmbeddingLayer`), 
+           the other weights staying in `dtype`
+        """
+        self.dtype = np.dtype(dtype)
+        cast = lambda value: np.asarray(value, dtype = self.dtype)
+        
+        # flipped filters, given by model bundles
+        filters_mats = getattr(params, "filters_mat", [None] * params.conv_layer_n)
+
+        self.e_layer = WordEmbeddingLayer(embeddings = cast(params.embeddings),
+                                          storage = embedding_storage)
         self.c_layers = []
         
         for i in xrange(params.conv_layer_n):
             self.c_layers.append(ConvFoldingPoolLayer(params.ks[i],
                                                       params.fold[i],
-                                                      W = params.W[i],
-                                                      b = params.b[i])
+                                                      W = cast(params.W[i]),
+                                                      b = cast(params.b[i]),
+                                                      filters_mat = (cast(filters_mats[i]) 
+                                                                     if filters_mats[i] is not None else None))
             )
 
         self.l_layer = LogisticRegression(
-            params.logreg_W,
-            params.logreg_b
+            cast(params.logreg_W),
+            cast(params.logreg_b),
+            V = (cast(params.logreg_V) if hasattr(params, "logreg_V") else None)
         )
 
+        self.plan_cache_size = plan_cache_size
+        self.plan_cache_bytes = plan_cache_bytes
+        self._plan_generation = 0
+        self._thread_local = threading.local()
+        # the plan caches of the live threads
+        self._plan_caches = weakref.WeakSet()
+        self._plan_lock = threading.Lock()
+
+        self.n_workers = n_workers
+        self.min_shard_size = min_shard_size
+        self._pool = None
+        # the calls running on the pool
+        self._pool_users = 0
+        self._closed = False
+        self._pool_lock = threading.Lock()
+
+    def plan(self, batch_size, length):
+        """
+        the execution plan for inputs of the given shape, 
+        from the LRU cache of the calling thread, 
+        whose oldest plans are dropped for the plans of all threads to fit `plan_cache_bytes`
+        """
+        local = self._thread_local
+        cache = getattr(local, "cache", None)
+        if cache is None or cache.generation != self._plan_generation:
+            cache = local.cache = _PlanCache(self._plan_generation)
+            with self._plan_lock:
+                self._plan_caches.add(cache)
+
+        key = (batch_size, length)
+        plan = cache.plans.pop(key, None)
+        if plan is None:
+            plan = ExecutionPlan(self, batch_size, length)
+            if self.plan_cache_bytes is not None and plan.nbytes > self.plan_cache_bytes:
+                # never kept, not to drop the others for it
+                return plan
+        else:
+            cache.nbytes -= plan.nbytes
+
+        with self._plan_lock:
+            while cache.plans and (len(cache.plans) >= self.plan_cache_size or 
+                                   not self._plan_fits(plan)):
+                cache.nbytes -= cache.plans.popitem(last = False)[1].nbytes
+
+            if self._plan_fits(plan):
+                cache.plans[key] = plan
+                cache.nbytes += plan.nbytes
+        return plan
+
+    def _plan_fits(self, plan):
+        return (self.plan_cache_bytes is None or 
+                self._plan_bytes() + plan.nbytes <= self.plan_cache_bytes)
+
+    def _plan_bytes(self):
+        return sum(cache.nbytes for cache in self._plan_caches)
+
+    def plan_bytes(self):
+        """
+        the bytes of the execution plans kept by all threads
+        """
+        with self._plan_lock:
+            return self._plan_bytes()
+
+    def clear_plans(self):
+        """
+        drop the execution plans of all threads, 
+        to be called when the layers change(e.g, the convolution algorithms)
+        """
+        self._plan_generation += 1
+
     def _p_y_given_x(self, x):
-        output = self.e_layer.output(x)
-        
-        for l in self.c_layers:
-            output = l.output(output)
+        if self.plan_cache_size > 0:
+            plan = self.plan(*x.shape)
+            output = self.e_layer.output(x, 
+                                         out = plan.embedding_out, 
+                                         flat_index = plan.flat_index,
+                                         gathered = plan.gathered)
+        else:
+            plan = None
+            output = self.e_layer.output(x)
+
+        return self._p_y_given_embedded(output, plan)
+
+    def _p_y_given_embedded(self, output, plan = None):
+        """
+        the forward pass from the embedding layer output on
+
+        plan: ExecutionPlan, optional
+           the plan of the input shape, whose conv layer buffers are used
+        """
+        layer_plans = (plan.layer_plans if plan is not None 
+                       else [None] * len(self.c_layers))
+        for l, layer_plan in zip(self.c_layers, layer_plans):
+            output = l.output(output, layer_plan)
 
         assert output.ndim == 4
         output = output.reshape(
@@ -197,6 +736,142 @@ class DCNN(object):
 
     def predict(self, x):
         return np.argmax(self._p_y_given_x(x), axis = 1)
+
+    def explain(self, words, padding_index):
+        """
+        Occlusion of each word of the sentence by the padding, all run as one batch: 
+        the sentence is gathered once and copied for each occlusion, 
+        the occluded column being overwritten by the padding embedding
+
+        words: 1d numpy.ndarray, the sentence in word indices
+
+        Returns:
+        - the label probabilities of the sentence
+        - the change of each label probability when each word is occluded, 
+          (words, labels), positive if the word raises it
+        """
+        words = np.asarray(words, dtype = np.int32)
+        n = len(words)
+
+        embedded = self.e_layer.output(words[np.newaxis, :])
+        padding = self.e_layer.output(np.asarray([[padding_index]], dtype = np.int32))[0, 0, :, 0]
+
+        # the sentence itself, then one row per occluded word
+        batch = np.repeat(embedded, n + 1, axis = 0)
+        batch[np.arange(1, n + 1), 0, :, np.arange(n)] = padding
+
+        plan = (self.plan(n + 1, n) if self.plan_cache_size > 0 else None)
+        p_y_given_x = self._p_y_given_embedded(batch, plan)
+
+        return p_y_given_x[0], p_y_given_x[0] - p_y_given_x[1:]
+
+    def acquire_pool(self):
+        """
+        the thread pool of `n_workers` threads, created at the first use, 
+        in use until `release_pool` is called
+        """
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPool(self.n_workers)
+            self._pool_users += 1
+            return self._pool
+
+    def release_pool(self):
+        with self._pool_lock:
+            self._pool_users -= 1
+            if self._closed and self._pool_users == 0:
+                self._stop_pool()
+
+    def close(self):
+        """
+        stop the threads of the pool, if created, for the model to be dropped, 
+        once the calls running on it are done. 
+        The model can still be called, the pool of such a call being stopped after it
+        """
+        with self._pool_lock:
+            self._closed = True
+            if self._pool_users == 0:
+                self._stop_pool()
+
+    def _stop_pool(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+
+    @property
+    def nbytes(self):
+        """
+        the memory taken by the weights, the execution plans excluded(see `memory_model.py`)
+        """
+        arrays = [self.l_layer.W, self.l_layer.b]
+        if self.l_layer.V is not None:
+            arrays.append(self.l_layer.V)
+        for l in self.c_layers:
+            arrays += [l.W, l.b]
+            if l._filters_mat is not None:
+                arrays.append(l._filters_mat)
+
+        return self.e_layer.nbytes + sum(a.nbytes for a in arrays)
+
+    def _p_y_given_x_parallel(self, x):
+        """
+        `_p_y_given_x` with the batch split into shards run on the thread pool,
+        numpy releasing the GIL inside its kernels.
+
+        Each thread runs its shards with its own execution plans
+        """
+        n_shards = min(self.n_workers, x.shape[0] // self.min_shard_size)
+        if n_shards <= 1:
+            return self._p_y_given_x(x)
+
+        shards = np.array_split(x, n_shards)
+        pool = self.acquire_pool()
+        try:
+            return np.concatenate(pool.map(self._p_y_given_x, shards))
+        finally:
+            self.release_pool()
+
+    def _p_y_given_x_packed(self, sents):
+        """
+        the packed mode: the sentences are not padded but concatenated along the word axis,
+        each conv layer running one convolution over the packed row.
+
+        The result for each sentence is the same as running it alone through `_p_y_given_x`
+
+        sents: list of 1d numpy.ndarray
+           the sentences in word indices, of any lengths
+        """
+        widths = np.array([len(sent) for sent in sents])
+        
+        output = self.e_layer.output(np.concatenate(sents)[np.newaxis, :])
+        
+        for l in self.c_layers:
+            output, widths = l.output_packed(output, widths)
+
+        assert (widths == widths[0]).all(), "sentences too short for the output layer: %r" %(widths)
+
+        # (1, feature maps, rows, sentences x width) to (sentences, feature maps x rows x width)
+        output = output[0].reshape(output.shape[1:3] + (len(sents), widths[0]))
+        output = output.transpose((2, 0, 1, 3)).reshape((len(sents), -1))
+        
+        return self.l_layer._p_y_given_x(output)
+
+    def _p_y_given_x_packed_parallel(self, sents):
+        """
+        `_p_y_given_x_packed` with the sentences split into shards run on the thread pool,
+        as `_p_y_given_x_parallel` does
+        """
+        n_shards = min(self.n_workers, len(sents) // self.min_shard_size)
+        if n_shards <= 1:
+            return self._p_y_given_x_packed(sents)
+
+        bounds = np.linspace(0, len(sents), n_shards + 1).astype(int)
+        shards = [sents[start: end] for start, end in zip(bounds[:-1], bounds[1:])]
+        pool = self.acquire_pool()
+        try:
+            return np.concatenate(pool.map(self._p_y_given_x_packed, shards))
+        finally:
+            self.release_pool()
  
     # The following functions are 
     # FOR TESTING PURPOSE               
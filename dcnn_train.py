@@ -7,6 +7,12 @@ A Convolutional Neural Network for Modeling Sentence
 import sys, os, time
 import pdb
 
+if __name__ == "__main__":
+    # before numpy and theano, which read the BLAS thread count once
+    import thread_budget
+    thread_budget.apply("training")
+    print thread_budget.describe()
+
 import math, random
 import numpy as np
 import theano
@@ -0,0 +1,97 @@
+"""
+Incremental scoring of a sentence being typed
+
+The `full` convolution output at column t depends on the input columns t - filter width + 1 to t only,
+so when the input of a conv layer keeps its first p columns from the previous call,
+the previous convolution output is kept for the columns before p
+and only the columns from p on are computed, from the last (filter width - 1) columns of the prefix onwards.
+Folding, k-max pooling and the output layer are re-run on the whole.
+
+The prefix is found by comparing the input of each layer with the previous one:
+at the first layer, it is the words kept from the previous call.
+As long as a sentence is short enough for k-max pooling to keep every column, it goes on to the next layer,
+otherwise the selected columns may shift and the next layer keeps less, if anything.
+
+The result is that of the full forward pass within float error, not exactly:
+the tail is convolved alone, and with a tuning table(see `autotune.py`)
+possibly by another algorithm than the prefix was.
+"""
+import numpy as np
+
+def common_prefix(a, b):
+    """
+    the number of leading columns(along the last axis) two 4d arrays have in common
+
+    >>> a = np.arange(6.).reshape((1, 1, 1, 6))
+    >>> b = a.copy(); b[..., 4] = -1
+    >>> common_prefix(a, b), common_prefix(a, b[..., :3]), common_prefix(a, a[..., 1:])
+    (4, 3, 0)
+    """
+    if b is None or a.shape[:3] != b.shape[:3]:
+        return 0
+    n = min(a.shape[3], b.shape[3])
+    equal = (a[..., :n] == b[..., :n]).reshape((-1, n)).all(axis = 0)
+    return n if equal.all() else int(np.argmin(equal))
+
+class IncrementalSession(object):
+    """
+    The scoring session of one sentence, whose words change a few at a time, mostly at the end
+    """
+    def __init__(self, model):
+        """
+        model: dcnn.DCNN
+        """
+        self.model = model
+        self.reset()
+
+    def reset(self):
+        # the input and the convolution output of each conv layer at the previous call
+        self._inputs = [None] * len(self.model.c_layers)
+        self._conv_outs = [None] * len(self.model.c_layers)
+
+        # number of convolution output columns computed and reused
+        self.computed_columns = 0
+        self.reused_columns = 0
+
+    def _conv(self, i, x):
+        """
+        the convolution of the i-th conv layer on `x`, reusing the previous output for the prefix
+        `x` shares with the previous input
+        """
+        l = self.model.c_layers[i]
+        filter_w = l.W.shape[3]
+
+        prefix = common_prefix(x, self._inputs[i])
+        if prefix == 0:
+            conv_out = l.conv(x)
+        else:
+            # the first output columns of the convolution on the tail are incomplete,
+            # as if the input before it were zero
+            start = max(0, prefix - filter_w + 1)
+            tail_out = l.conv(x[..., start:])
+            conv_out = np.concatenate([self._conv_outs[i][..., :prefix],
+                                       tail_out[..., prefix - start:]],
+                                      axis = 3)
+
+        self.reused_columns += prefix
+        self.computed_columns += conv_out.shape[3] - prefix
+
+        self._inputs[i] = x
+        self._conv_outs[i] = conv_out
+        return conv_out
+
+    def p_y_given_x(self, words):
+        """
+        the label probabilities of the sentence, as `DCNN._p_y_given_x` would give within float error
+
+        words: 1d numpy.ndarray, the word indices
+        """
+        words = np.asarray(words, dtype = np.int32)
+        assert words.ndim == 1 and words.size > 0, "empty sentence"
+
+        output = self.model.e_layer.output(words[np.newaxis, :])
+        for i, l in enumerate(self.model.c_layers):
+            # folding happens in place: on a copy, to keep the cached convolution output
+            output = l.fold_k_max_pool(self._conv(i, output).copy())
+
+        return self.model.l_layer._p_y_given_x(output.reshape((1, -1)))
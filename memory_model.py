@@ -0,0 +1,171 @@
+"""
+Memory model of the DCNN forward pass
+
+The planned forward pass(see `dcnn.ExecutionPlan`) keeps all its buffers alive together,
+so its peak is the sum of their sizes, which are linear in the batch size for a given length.
+This gives the largest batch of a given sentence length that fits a memory budget, 
+the plans the model keeps for later calls taking their part of it.
+
+Usage: python memory_model.py --model_path [model path] [--batch_sizes 10 100 1000] [--lengths 10 40]
+"""
+import numpy as np
+
+from numpy_impl import fft_params
+
+def layer_bytes(layer, input_shape, dtype):
+    """
+    the bytes of the intermediates of a conv layer, as allocated by `dcnn.LayerPlan`
+    or, for "fft" and "scipy", by the convolution itself
+
+    Returns:
+    list of (name, bytes) and the output shape
+    """
+    batch_size, input_feature_n, rows, cols = input_shape
+    output_feature_n, _, filter_h, filter_w = layer.W.shape
+    conv_rows, conv_cols = rows + filter_h - 1, cols + filter_w - 1
+    itemsize = np.dtype(dtype).itemsize
+    intp = np.dtype(np.intp).itemsize
+
+    items = []
+    conv_algo = layer.select_conv_algo(batch_size, cols)
+    if conv_algo == "gemm":
+        items += [("padded", batch_size * input_feature_n * rows * (cols + 2 * (filter_w - 1)) * itemsize),
+                  ("unrolled", input_feature_n * filter_w * batch_size * rows * conv_cols * itemsize),
+                  ("conv_out", output_feature_n * batch_size * rows * conv_cols * itemsize)]
+    elif conv_algo == "fft":
+        axes, fft_shape = fft_params(input_shape, layer.W.shape)
+        freq_rows = (conv_rows if len(axes) == 1 else fft_shape[0])
+        freq_cols = fft_shape[-1] // 2 + 1
+        complex_size = np.dtype(np.complex128).itemsize
+        items += [("input_freq", batch_size * input_feature_n * freq_rows * freq_cols * complex_size),
+                  ("output_freq", batch_size * output_feature_n * freq_rows * freq_cols * complex_size),
+                  ("ifft", batch_size * output_feature_n * freq_rows * fft_shape[-1] * 8),
+                  ("conv_out", batch_size * output_feature_n * conv_rows * conv_cols * itemsize)]
+    else:
+        items += [("conv_out", batch_size * output_feature_n * conv_rows * conv_cols * itemsize)]
+
+    fold_rows = (conv_rows // 2 if layer.fold_flag else conv_rows)
+    fold_size = batch_size * output_feature_n * fold_rows * conv_cols
+    k = min(layer.k, conv_cols)
+
+    items += [("fold_out", fold_size * itemsize),
+              ("pool_out", (batch_size * output_feature_n * fold_rows * k + 1) * itemsize)]
+
+    if k < conv_cols:
+        items += [("partitioned", fold_size * itemsize),
+                  ("selected", fold_size),
+                  ("ties", fold_size),
+                  ("positions", fold_size * intp),
+                  ("row_offsets", batch_size * output_feature_n * fold_rows * intp)]
+
+    return items, (batch_size, output_feature_n, fold_rows, k)
+
+def estimate_bytes(model, batch_size, length):
+    """
+    the bytes of each intermediate of the planned forward pass of `model`(dcnn.DCNN)
+    on a batch of the given shape
+
+    Returns:
+    list of (name, bytes)
+    """
+    e_layer = model.e_layer
+    embed_dm = e_layer.embeddings.shape[1]
+    n = batch_size * embed_dm * length
+
+    items = [("input", batch_size * length * 4),
+             ("embedding_out", n * e_layer.dtype.itemsize),
+             ("flat_index", n * np.dtype(np.intp).itemsize)]
+    if e_layer.storage is not None:
+        items.append(("gathered", n * e_layer.embeddings.dtype.itemsize))
+
+    shape = (batch_size, 1, embed_dm, length)
+    for i, l in enumerate(model.c_layers):
+        layer_items, shape = layer_bytes(l, shape, model.dtype)
+        items += [("layer%d.%s" %(i + 1, name), nbytes)
+                  for name, nbytes in layer_items]
+
+    n_labels = model.l_layer.b.shape[0]
+    items.append(("p_y_given_x", batch_size * n_labels * model.dtype.itemsize * 2))
+    return items
+
+def estimate_peak_bytes(model, batch_size, length):
+    """
+    the estimated peak of the forward pass: all the intermediates alive together
+    """
+    return sum(nbytes for name, nbytes in estimate_bytes(model, batch_size, length))
+
+def fit_batch_size(model, length, budget):
+    """
+    the largest batch of sentences of the given length whose estimated peak is within `budget` bytes,
+    at least 1
+    """
+    return max(1, int(budget // estimate_peak_bytes(model, 1, length)))
+
+def split_by_budget(batch, length, model, budget):
+    """
+    split the sentence positions of a batch into chunks that fit `budget` bytes at the given length, 
+    less the bytes of the execution plans the model keeps(see `dcnn.DCNN.plan_bytes`)
+    """
+    size = fit_batch_size(model, length, budget - model.plan_bytes())
+    return [batch[i: i + size] for i in xrange(0, len(batch), size)]
+
+def _proc_status(key):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(key):
+                return int(line.split()[1]) * 1024
+
+def observed_peak_bytes(f):
+    """
+    the increase of the resident set at its peak while running `f()`,
+    by resetting the high water mark of the process(Linux only)
+    """
+    rss = _proc_status("VmRSS:")
+    with open("/proc/self/clear_refs", "w") as clear_refs:
+        clear_refs.write("5")
+    f()
+    return _proc_status("VmHWM:") - rss
+
+if __name__ == "__main__":
+    import argparse, sys
+    from param_util import load_dcnn_model_params
+    from dcnn import DCNN
+
+    parser = argparse.ArgumentParser(description = "Estimated versus observed peak memory of the forward pass")
+    parser.add_argument("--model_path", type=str, required = True,
+                        help = "Path of model parameters"
+    )
+    parser.add_argument("--batch_sizes", type=int, nargs = "+", default = [10, 100, 1000],
+                        help = "Batch sizes"
+    )
+    parser.add_argument("--lengths", type=int, nargs = "+", default = [10, 40],
+                        help = "Sentence lengths"
+    )
+    parser.add_argument("--budget", type=float, default = 256,
+                        help = "Memory budget in MB, to print the largest batch of each length"
+    )
+    args = parser.parse_args(sys.argv[1:])
+
+    model = DCNN(load_dcnn_model_params(args.model_path))
+    vocab_size = model.e_layer.embeddings.shape[0]
+    MB = 1024. ** 2
+
+    for length in args.lengths:
+        for batch_size in args.batch_sizes:
+            x = np.asarray(np.random.randint(vocab_size, size = (batch_size, length)), dtype = np.int32)
+            items = estimate_bytes(model, batch_size, length)
+            largest = max(items, key = lambda item: item[1])
+
+            # the plans dropped, for their buffers to be allocated within the call
+            model.clear_plans()
+            observed = observed_peak_bytes(lambda: model._p_y_given_x(x))
+
+            print "batch %5d, length %3d: estimated %.1f MB(largest %s, %.1f MB), observed %.1f MB" %(
+                batch_size, length,
+                sum(nbytes for name, nbytes in items) / MB,
+                largest[0], largest[1] / MB,
+                observed / MB
+            )
+
+        print "length %3d: at most %d sentences within %.0f MB" %(
+            length, fit_batch_size(model, length, args.budget * MB), args.budget)
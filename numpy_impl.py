@@ -1,4 +1,5 @@
 import numpy as np
+from numpy.lib.stride_tricks import as_strided
 from scipy.signal import convolve2d
 
 def conv2d(input_feature_map, filters, mode = "full"):
@@ -18,7 +19,8 @@ def conv2d(input_feature_map, filters, mode = "full"):
     output_feature_map = np.zeros((batch_size, 
                                    output_feature_n, 
                                    input_w + filter_w - 1, 
-                                   input_h + filter_h - 1))
+                                   input_h + filter_h - 1), 
+                                  dtype = np.result_type(input_feature_map, filters))
 
     for i in xrange(batch_size):
         # for the ith instance
@@ -33,6 +35,183 @@ def conv2d(input_feature_map, filters, mode = "full"):
     return output_feature_map
 
 
+def fast_fft_len(n):
+    """
+    The smallest 5-smooth number(2^a * 3^b * 5^c) no less than `n`,
+    sizes for which FFT is fast
+
+    >>> fast_fft_len(7)
+    8
+    >>> fast_fft_len(11)
+    12
+    >>> fast_fft_len(1)
+    1
+    """
+    best = 1
+    while best < n:
+        best *= 2
+
+    p5 = 1
+    while p5 < best:
+        p35 = p5
+        while p35 < best:
+            p = p35
+            while p < n:
+                p *= 2
+            best = min(best, p)
+            p35 *= 3
+        p5 *= 5
+    return best
+
+
+def fft_params(input_shape, filter_shape):
+    """
+    The axes and sizes of the FFT used by `conv2d_fft` for the given 4d input and filter shapes.
+
+    For filters of height 1, the rows are independent and only the word axis(the last one) is transformed
+
+    >>> fft_params((10, 1, 48, 13), (7, 1, 1, 8))
+    ((3,), (20,))
+    >>> fft_params((10, 1, 48, 13), (7, 1, 2, 8))
+    ((2, 3), (50, 20))
+    """
+    rows = input_shape[2] + filter_shape[2] - 1
+    cols = input_shape[3] + filter_shape[3] - 1
+
+    if filter_shape[2] == 1:
+        return (3, ), (fast_fft_len(cols), )
+    else:
+        return (2, 3), (fast_fft_len(rows), fast_fft_len(cols))
+
+
+def filters_fft(filters, axes, fft_shape):
+    """
+    Spectrum of the filters, which can be computed once and reused by `conv2d_fft`
+    for all the inputs that share the same FFT size
+    """
+    return np.fft.rfftn(filters, s = fft_shape, axes = axes)
+
+
+def conv2d_fft(input_feature_map, filters, mode = "full", filters_freq = None):
+    """
+    Batched equivalent of `conv2d` through FFT:
+    the whole (batch, input feature maps) block is transformed at once and convolved against all the filters
+    by a product-sum in the frequency domain
+
+    filters_freq: numpy.ndarray
+        the spectrum given by `filters_fft`, computed if not given
+    """
+    assert mode == "full", "only `full` mode is supported"
+    assert len(input_feature_map.shape) == 4
+    assert len(filters.shape) == 4
+    assert input_feature_map.shape[1] == filters.shape[1], "%d != %d" %(input_feature_map.shape[1], filters.shape[1])
+
+    axes, fft_shape = fft_params(input_feature_map.shape, filters.shape)
+
+    if filters_freq is None:
+        filters_freq = filters_fft(filters, axes, fft_shape)
+
+    input_freq = np.fft.rfftn(input_feature_map, s = fft_shape, axes = axes)
+
+    # sum over the input feature maps of the element-wise products
+    output_freq = np.einsum("ilxy,klxy->ikxy", input_freq, filters_freq)
+
+    output_feature_map = np.fft.irfftn(output_freq, s = fft_shape, axes = axes)
+
+    # FFT is done in double precision
+    return output_feature_map[:, :,
+                              :input_feature_map.shape[2] + filters.shape[2] - 1,
+                              :input_feature_map.shape[3] + filters.shape[3] - 1].astype(
+                                  np.result_type(input_feature_map, filters))
+
+
+def filters_matrix(filters):
+    """
+    The height-1 filters flipped along the word axis and flattened into
+    (number of filters, number of input feature maps x filter width),
+    which can be computed once and reused by `conv1d_gemm`
+    """
+    assert filters.shape[2] == 1, "filter height should be 1"
+    return np.ascontiguousarray(filters[:, :, 0, ::-1]).reshape((filters.shape[0], -1))
+
+
+def conv1d_gemm(input_feature_map, filters, mode = "full", filters_mat = None,
+                padded = None, unrolled = None, out = None):
+    """
+    Equivalent of `conv2d` for height-1 filters, 
+    where each row of each input feature map is an independent 1D sequence.
+
+    The windows along the word axis for all (batch x rows) sequences are unrolled(im2col) 
+    so that all the filters are applied by one matrix product.
+    
+    filters_mat: numpy.ndarray
+        the matrix given by `filters_matrix`, computed if not given
+
+    padded, unrolled, out: numpy.ndarray, optional
+        preallocated buffers for the input padded along the word axis(whose padding columns should be zeros),
+        the unrolled windows and the matrix product
+
+    Returns: 
+    4D numpy.ndarray, (batch size, number of filters, rows, words + filter width - 1),
+    a transposed view of the matrix product result
+    """
+    assert mode == "full", "only `full` mode is supported"
+    assert len(input_feature_map.shape) == 4
+    assert len(filters.shape) == 4
+    
+    batch_size, input_feature_n1, rows, cols = input_feature_map.shape
+    output_feature_n, input_feature_n2, filter_h, filter_w = filters.shape
+
+    assert input_feature_n1 == input_feature_n2, "%d != %d" %(input_feature_n1, input_feature_n2)
+    assert filter_h == 1, "filter height should be 1"
+
+    if filters_mat is None:
+        filters_mat = filters_matrix(filters)
+
+    output_cols = cols + filter_w - 1
+
+    # zero padding on both sides of the word axis
+    if padded is None:
+        padded = np.zeros((batch_size, input_feature_n1, rows, cols + 2 * (filter_w - 1)), 
+                          dtype = input_feature_map.dtype)
+    padded[:, :, :, filter_w - 1: filter_w - 1 + cols] = input_feature_map
+    
+    # windows[l, j, i, r, t] = padded[i, l, r, t + j]
+    stride0, stride1, stride2, stride3 = padded.strides
+    windows = as_strided(padded, 
+                         shape = (input_feature_n1, filter_w, batch_size, rows, output_cols), 
+                         strides = (stride1, stride3, stride0, stride2, stride3))
+    
+    if unrolled is None:
+        unrolled = windows.reshape((input_feature_n1 * filter_w, batch_size * rows * output_cols))
+    else:
+        np.copyto(unrolled.reshape(windows.shape), windows)
+
+    output_feature_map = np.dot(filters_mat, unrolled, out = out)
+
+    return output_feature_map.reshape((output_feature_n, batch_size, rows, output_cols)).swapaxes(0, 1)
+
+
+def quantize_rows(w, dtype = np.float32):
+    """
+    Row-wise symmetric int8 quantization: each row is scaled so that its largest absolute value maps to 127
+
+    Returns:
+    the int8 matrix and the scale of each row, w ~= q * scales[:, np.newaxis]
+
+    >>> q, scales = quantize_rows(np.asarray([[0.5, -1.0], [0.0, 0.0]]))
+    >>> q.tolist()
+    [[64, -127], [0, 0]]
+    >>> np.allclose(scales * 127, [1, 0])
+    True
+    """
+    scales = np.abs(w).max(axis = 1) / 127.
+    
+    safe_scales = np.where(scales > 0, scales, 1)
+    q = np.round(w / safe_scales[:, np.newaxis]).astype(np.int8)
+    
+    return q, scales.astype(dtype)
+
 
 def softmax(w):
     """
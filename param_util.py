@@ -1,11 +1,11 @@
 """
 Utility for model parameter
 """
-import os
+import os, tempfile
 try:
-    from cPickle import load
+    from cPickle import (load, dump, UnpicklingError)
 except ImportError:
-    from pickle import load
+    from pickle import (load, dump, UnpicklingError)
 
 class Params(object):
     pass
@@ -58,3 +58,56 @@ def parse_param_string(s, desired_fields = {"ks", "fold", "conv_layer_n"}):
                 else:
                     setattr(p, key, tuple(map(int, value.split(','))))
     return p
+
+def word2index_path(corpus_path):
+    """
+    the vocabulary file next to the preprocessed corpus
+
+    >>> word2index_path("data/twitter.pkl")
+    'data/twitter.word2index.pkl'
+    """
+    return os.path.splitext(corpus_path)[0] + ".word2index.pkl"
+
+def load_word2index(corpus_path):
+    """
+    the word2index of the preprocessed corpus(its 4th item), from the vocabulary file next to it, 
+    which is written from the corpus the first time, 
+    so the train/dev/test data are not loaded for the vocabulary alone
+
+    The file is written to a temporary file renamed into place,
+    so processes starting at once never read it half-written,
+    and one left truncated(e.g, by an older version) is written again
+    """
+    path = word2index_path(corpus_path)
+    if os.path.exists(path):
+        try:
+            return load(open(path, "rb"))
+        except (EOFError, UnpicklingError, ValueError):
+            # truncated or corrupted, written again below
+            pass
+
+    word2index = load(open(corpus_path))[3]
+    save_word2index(word2index, path)
+    return word2index
+
+def save_word2index(word2index, path):
+    """
+    Write the vocabulary file atomically, doing nothing if its directory is read-only
+    (the corpus is then read again next time)
+    """
+    try:
+        f = tempfile.NamedTemporaryFile(dir = os.path.dirname(path) or ".",
+                                        prefix = os.path.basename(path) + ".",
+                                        delete = False)
+    except (IOError, OSError):
+        return
+    try:
+        with f:
+            dump(word2index, f, protocol = 2)
+        os.rename(f.name, path)
+    except (IOError, OSError):
+        # e.g, a full disk
+        try:
+            os.remove(f.name)
+        except OSError:
+            pass
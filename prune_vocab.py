@@ -0,0 +1,225 @@
+"""
+Serving-time vocabulary pruning
+
+The words are ranked by their frequency in a sample of the live traffic(e.g, the tweets collected by `data_collection.py`),
+then by their frequency in the training set.
+The top-N words are kept, and so are the words of the dev sentences whose prediction the pruning changes,
+until the dev error is within the tolerance of the full vocabulary's.
+The other words are dropped from the vocabulary and, at serving time, mapped to the `<UNK>` row
+(see `sentiment.get_word_index_array`), which is the mean of their embeddings if the vocabulary has none.
+
+The result is the smaller embedding table with the smaller vocabulary remapped to it,
+saved next to the model, where `sentiment.py` looks for it.
+
+Usage: python prune_vocab.py --model_path [model path] --traffic_path data_collected.csv --top_n 5000 [--tolerance 0.005]
+"""
+import os, csv, copy
+import numpy as np
+from cPickle import (load, dump)
+
+from dcnn import DCNN
+
+UNK_TOKEN = u"<UNK>"
+PADDING_TOKEN = u"<PADDING>"
+
+def vocab_path(model_path):
+    """
+    >>> vocab_path("models/ks=20,8,,dr=0.5,0.5.pkl")
+    'models/ks=20,8,,dr=0.5,0.5.vocab.pkl'
+    """
+    return os.path.splitext(model_path)[0] + ".vocab.pkl"
+
+def read_traffic(path):
+    """
+    the texts of the collected tweet csv, whose rows are ("label", "text")
+    """
+    with open(path, "r") as f:
+        return [row[-1].decode("utf8") for row in csv.reader(f) if row]
+
+def traffic_counts(texts, word2index, vocab_size, tokenize):
+    """
+    the number of occurrences of each vocabulary row in the tokenized texts
+
+    >>> traffic_counts([u"a b a", u"c d"], {u"a": 0, u"b": 1, u"c": 2}, 4, lambda text: text.split()).tolist()
+    [2, 1, 1, 0]
+    """
+    counts = np.zeros(vocab_size, dtype = np.int64)
+    for text in texts:
+        for word in tokenize(text):
+            index = word2index.get(word)
+            if index is not None:
+                counts[index] += 1
+    return counts
+
+def rank_rows(traffic, train):
+    """
+    the rows by decreasing traffic count, then by decreasing training count
+
+    >>> rank_rows(np.asarray([0, 5, 0, 5]), np.asarray([3, 1, 9, 2])).tolist()
+    [3, 1, 2, 0]
+    """
+    return np.lexsort((-np.asarray(train), -np.asarray(traffic)))
+
+def prune(embeddings, word2index, keep_rows):
+    """
+    Keep the given rows, in their order, after `<PADDING>` and `<UNK>`,
+    the other words being dropped, for `<UNK>` to stand for them
+
+    Returns:
+    - word2index of the pruned table, with the words of the kept rows and `<UNK>`
+    - the pruned embedding table
+    - the mapping of original rows to pruned ones, `<UNK>` for the dropped ones
+    """
+    vocab_size = embeddings.shape[0]
+
+    special_rows = [word2index[token]
+                    for token in (PADDING_TOKEN, UNK_TOKEN)
+                    if token in word2index]
+    kept = np.asarray(special_rows + [row for row in keep_rows if row not in special_rows],
+                      dtype = np.intp)
+
+    pruned_mask = np.ones(vocab_size, dtype = np.bool_)
+    pruned_mask[kept] = False
+
+    if UNK_TOKEN in word2index:
+        unk_row = np.flatnonzero(kept == word2index[UNK_TOKEN])[0]
+        new_embeddings = embeddings[kept]
+    else:
+        # the average of the words it replaces
+        unk_row = len(kept)
+        unk_embedding = (embeddings[pruned_mask].mean(axis = 0) if pruned_mask.any()
+                         else np.zeros(embeddings.shape[1], dtype = embeddings.dtype))
+        new_embeddings = np.concatenate([embeddings[kept], unk_embedding[np.newaxis, :]])
+
+    old_to_new = np.empty(vocab_size, dtype = np.int32)
+    old_to_new.fill(unk_row)
+    old_to_new[kept] = np.arange(len(kept))
+
+    new_word2index = dict((word, int(old_to_new[index]))
+                          for word, index in word2index.iteritems()
+                          if not pruned_mask[index])
+    new_word2index[UNK_TOKEN] = int(unk_row)
+
+    return new_word2index, new_embeddings, old_to_new
+
+def predict_in_batches(model, x, batch_size = 500):
+    return np.concatenate([model.predict(x[i: i + batch_size])
+                           for i in xrange(0, x.shape[0], batch_size)])
+
+def prune_vocab(params, word2index, ranking, top_n, dev, tolerance, log = None):
+    """
+    Prune to the `top_n` first rows of `ranking`, adding the original words of the dev sentences
+    whose prediction changes until the dev error is within `tolerance` of the full vocabulary's
+
+    dev: (x, y), the dev set in original word indices
+
+    Returns:
+    the result of `prune`
+
+    Raises:
+    ValueError if the tolerance is not met with every word of those sentences kept
+    """
+    x, y = dev
+    full_pred = predict_in_batches(DCNN(params), x)
+    full_error = np.mean(full_pred != y)
+
+    keep_rows = list(ranking[:top_n])
+    pruned_params = copy.copy(params)
+
+    while True:
+        new_word2index, new_embeddings, old_to_new = prune(params.embeddings, word2index, keep_rows)
+        pruned_params.embeddings = new_embeddings
+
+        pred = predict_in_batches(DCNN(pruned_params), old_to_new[x])
+        error = np.mean(pred != y)
+
+        if log:
+            log("%d rows: dev error %.2f%%(%+.2f%%)" %(
+                new_embeddings.shape[0], error * 100, (error - full_error) * 100))
+
+        if error - full_error <= tolerance:
+            return new_word2index, new_embeddings, old_to_new
+
+        # the pruned words of the sentences whose prediction changed
+        changed = x[pred != full_pred]
+        unk_row = new_word2index[UNK_TOKEN]
+        missing = np.unique(changed[old_to_new[changed] == unk_row])
+        missing = [row for row in missing if row != word2index.get(UNK_TOKEN)]
+
+        if not missing:
+            raise ValueError("dev error %.2f%%(%+.2f%%) with every word of the changed sentences kept, "
+                             "above the tolerance of %+.2f%%" %(
+                                 error * 100, (error - full_error) * 100, tolerance * 100))
+        keep_rows.extend(missing)
+
+def save_vocab(word2index, embeddings, path):
+    dump({"word2index": word2index,
+          "embeddings": embeddings},
+         open(path, "wb"),
+         protocol = 2)
+
+def load_vocab(path):
+    """
+    Returns:
+    the word2index and the embedding table saved by `save_vocab`
+    """
+    data = load(open(path, "rb"))
+    return data["word2index"], data["embeddings"]
+
+if __name__ == "__main__":
+    import argparse, sys
+    from tokenizer import word_tokenize
+    from param_util import load_dcnn_model_params
+    from bundle import token_counts
+
+    parser = argparse.ArgumentParser(description = "Serving-time vocabulary pruning")
+    parser.add_argument("--model_path", type=str, required = True,
+                        help = "Path of model parameters"
+    )
+    parser.add_argument("--corpus_path", type=str, default = "data/twitter.pkl",
+                        help = "Path of preprocessed corpus, for the vocabulary, the training frequencies and the dev/test sets"
+    )
+    parser.add_argument("--traffic_path", type=str, required = True,
+                        help = "Path of the traffic sample, the csv of collected tweets"
+    )
+    parser.add_argument("--top_n", type=int, default = 5000,
+                        help = "Number of words kept by traffic frequency"
+    )
+    parser.add_argument("--tolerance", type=float, default = 0.005,
+                        help = "Dev error increase allowed"
+    )
+    parser.add_argument("--output", type=str,
+                        help = "Path of the pruned vocabulary, next to the model by default"
+    )
+    args = parser.parse_args(sys.argv[1:])
+
+    params = load_dcnn_model_params(args.model_path)
+    data = load(open(args.corpus_path))
+    word2index = data[3]
+    vocab_size = params.embeddings.shape[0]
+
+    train = token_counts(data[0][0], vocab_size, padding_index = word2index.get(PADDING_TOKEN))
+    traffic = traffic_counts(read_traffic(args.traffic_path), word2index, vocab_size, word_tokenize)
+    ranking = rank_rows(traffic, train)
+
+    dev_x, dev_y = np.asarray(data[1][0], dtype = np.int32), np.asarray(data[1][1])
+    test_x, test_y = np.asarray(data[2][0], dtype = np.int32), np.asarray(data[2][1])
+
+    def log(line):
+        print line
+    new_word2index, new_embeddings, old_to_new = prune_vocab(params, word2index, ranking, args.top_n,
+                                                             (dev_x, dev_y), args.tolerance, log = log)
+
+    pruned_params = copy.copy(params)
+    pruned_params.embeddings = new_embeddings
+    full_error = np.mean(predict_in_batches(DCNN(params), test_x) != test_y)
+    error = np.mean(predict_in_batches(DCNN(pruned_params), old_to_new[test_x]) != test_y)
+    print "%d of %d rows(%d of %d words) kept, %.1f KB to %.1f KB(float32), test error %.2f%%(%+.2f%%)" %(
+        new_embeddings.shape[0], vocab_size, len(new_word2index), len(word2index),
+        vocab_size * new_embeddings.shape[1] * 4 / 1024., new_embeddings.size * 4 / 1024.,
+        error * 100, (error - full_error) * 100
+    )
+
+    path = args.output or vocab_path(args.model_path)
+    save_vocab(new_word2index, new_embeddings, path)
+    print "Vocabulary written to %s" %(path)
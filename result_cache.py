@@ -0,0 +1,88 @@
+"""
+Bounded caches of the sentiment scores, for the live traffic that repeats itself
+(retweets, copy-pasted campaigns, the same hashtag searches)
+
+Two levels:
+- raw text to score, skipping the tokenization as well
+- word index sequence to score, shared by the texts that tokenize the same way
+
+Both are dropped when the model they were computed with changes.
+"""
+import threading
+from collections import OrderedDict
+
+class LRUCache(object):
+    """
+    Dictionary of at most `max_size` entries, the least recently used dropped first
+
+    >>> cache = LRUCache(2)
+    >>> cache.put("a", 1); cache.put("b", 2)
+    >>> cache.get("a")
+    1
+    >>> cache.put("c", 3)
+    >>> cache.get("b") is None, cache.get("c")
+    (True, 3)
+    >>> cache.hits, cache.misses
+    (2, 1)
+    """
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self._entries.pop(key, None)
+        if value is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._entries[key] = value
+        return value
+
+    def put(self, key, value):
+        if self.max_size <= 0:
+            return
+        self._entries.pop(key, None)
+        if len(self._entries) >= self.max_size:
+            self._entries.popitem(last = False)
+        self._entries[key] = value
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+class ResultCache(object):
+    """
+    The two-level score cache of one model
+    """
+    def __init__(self, text_size = 100000, words_size = 100000):
+        self.texts = LRUCache(text_size)
+        self.words = LRUCache(words_size)
+        # what the scores were computed with
+        self.source = None
+        self.lock = threading.Lock()
+
+    def validate(self, source):
+        """
+        drop everything if the scores were computed with something else
+
+        source: what the scores depend on, compared by equality, e.g. (model, cascade)
+        """
+        if source != self.source:
+            self.invalidate()
+            self.source = source
+
+    def invalidate(self):
+        self.texts.clear()
+        self.words.clear()
+
+    def stats(self):
+        """
+        the size, hits and misses of each level
+        """
+        return dict((name, {"size": len(cache), "hits": cache.hits, "misses": cache.misses})
+                    for name, cache in (("texts", self.texts), ("words", self.words)))
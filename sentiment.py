@@ -1,22 +1,50 @@
 """
 Sentiment prediction module
+
+A `Predictor` scores with one model and its vocabulary. 
+The predictors are loaded by model name at their first use by `REGISTRY`, 
+the module functions using the one of `MODEL_PATH`. 
+numpy and the model modules are imported then too, so that importing this module is cheap
 """
-import nltk
-import numpy as np
+# before numpy, which reads the BLAS thread count once
+import thread_budget
+BUDGET = thread_budget.apply("inference")
+
+import os, sys, time, threading
+from bisect import bisect_left
+from collections import OrderedDict
+
+from param_util import load_word2index
+from result_cache import ResultCache
+
+# "regex" for `tokenizer.word_tokenize`, "nltk" for `nltk.word_tokenize`, which it reproduces,
+# either being imported at the first call
+TOKENIZER = "regex"
+
+def word_tokenize(text):
+    if TOKENIZER == "nltk":
+        import nltk
+        return nltk.word_tokenize(text)
 
-from cPickle import load
+    import tokenizer
+    return tokenizer.word_tokenize(text)
 
-def get_word_index_array(words, word2index):
+def get_word_index_array(words, word2index, unk_index = None):
     u"""
     Transform the words into list of int(word index)
     
-    Note: Unknown words are dropped
+    Note: Unknown words are dropped, or mapped to `unk_index` if given
     
     >>> words = [u"I", u"love", u"you", u"RANDOM STUFF"]
     >>> word2index = {u"I": 0, u"love": 1, u"you": 2}
     >>> get_word_index_array(words, word2index)
     [0, 1, 2]
+    >>> get_word_index_array(words, word2index, unk_index = 3)
+    [0, 1, 2, 3]
     """
+    if unk_index is not None:
+        return [word2index.get(w, unk_index) for w in words]
+
     return [word2index[w] 
             for w in words 
             if word2index.get(w) is not None # filter out those unknown
@@ -26,53 +54,602 @@ def get_word_index_array(words, word2index):
 def pad_sents(sents, padding_token_index):
     """
 
-    Pad the sents(in word index form) into same length so they can form a matrix
+    Pad the sents(in word index form) into same length so they can form a matrix,
+    written directly into an int32 array. 
+    The DCNN is never run on padded sentences(see `Predictor._scores_of_word_indices`), 
+    only the linear model of the cascade, which excludes the padding
     
     # 15447
     >>> sents = [[1,2,3], [1,2], [1,2,3,4,5]]
     >>> pad_sents(sents, padding_token_index = -1)
-    [[1, 2, 3, -1, -1], [1, 2, -1, -1, -1], [1, 2, 3, 4, 5]]
+    array([[ 1,  2,  3, -1, -1],
+           [ 1,  2, -1, -1, -1],
+           [ 1,  2,  3,  4,  5]], dtype=int32)
     """
-    max_len_sent = max(sents, 
-                       key = lambda sent: len(sent))
-    max_len = len(max_len_sent)
-    
-    get_padding = lambda sent: [padding_token_index] * (max_len - len(sent))
-    padded_sents = [(sent + get_padding(sent))
-                    for sent in sents]
+    import numpy as np
+
+    max_len = max(len(sent) for sent in sents)
+
+    padded_sents = np.full((len(sents), max_len), padding_token_index, 
+                           dtype = np.int32)
+    for i, sent in enumerate(sents):
+        padded_sents[i, :len(sent)] = sent
+
     return padded_sents
 
 
-WORD2INDEX = load(open("data/twitter.pkl"))[3]
-PADDING_INDEX = WORD2INDEX[u"<PADDING>"]
+# upper bounds of the sentence lengths of the buckets the texts of `Predictor.iter_scores` wait in, 
+# the last bucket being unbounded
+LENGTH_BUCKETS = (10, 20, 40)
+
+MAX_BATCH_SIZE = 100
+
+def length_bucket(length, boundaries):
+    """
+    the bucket of the length: the first boundary it is within, 
+    the bucket after the last boundary if none
 
-from param_util import load_dcnn_model_params
-from dcnn import DCNN
+    >>> [length_bucket(length, (5, 20)) for length in (1, 5, 6, 20, 21)]
+    [0, 0, 1, 1, 2]
+    """
+    return bisect_left(boundaries, length)
 
-params = load_dcnn_model_params("models/filter_widths=8,6,,batch_size=10,,ks=20,8,,fold=1,1,,conv_layer_n=2,,ebd_dm=48,,l2_regs=1e-06,1e-06,1e-06,0.0001,,dr=0.5,0.5,,nkerns=7,12.pkl")
+def length_buckets(lengths, boundaries, max_batch_size = MAX_BATCH_SIZE):
+    """
+    Split the sentences, sorted by length, into batches of similar lengths: 
+    by the bucket boundaries(see `length_bucket`) and by at most `max_batch_size` sentences per batch, if not None. 
+    With the distinct lengths as boundaries, each batch is of one length
 
-MODEL = DCNN(params)
+    Return:
+    list of the sentence positions of each batch
 
-def sentiment_scores_of_sents(sents):
+    >>> batches = length_buckets([3, 25, 5, 12, 4], boundaries = (5, 20), max_batch_size = 2)
+    >>> [batch.tolist() for batch in batches]
+    [[0, 4], [2], [3], [1]]
     """
-    Predict the sentiment positive scores for a bunch of sentences
+    import numpy as np
+
+    lengths = np.asarray(lengths)
+    order = np.argsort(lengths, kind = "mergesort")
     
-    >>> sentiment_scores_of_sents([u'simultaneously heart breaking and very funny , the last kiss is really all about performances .', u'( u ) stupid .'])
-    array([ 0.78528505,  0.0455901 ])
+    bucket_ids = np.asarray([length_bucket(length, boundaries) for length in lengths[order]])
+    bucket_starts = np.flatnonzero(np.diff(bucket_ids)) + 1
+
+    return [bucket[i: i + (max_batch_size or len(bucket))]
+            for bucket in np.split(order, bucket_starts)
+            for i in xrange(0, len(bucket), max_batch_size or max(len(bucket), 1))]
+
+
+MODEL_PATH = "models/filter_widths=8,6,,batch_size=10,,ks=20,8,,fold=1,1,,conv_layer_n=2,,ebd_dm=48,,l2_regs=1e-06,1e-06,1e-06,0.0001,,dr=0.5,0.5,,nkerns=7,12.pkl"
+
+# the directory of the models `REGISTRY` loads by name
+MODELS_DIR = "models"
+
+# the preprocessed corpus, whose vocabulary alone is read(see `param_util.load_word2index`)
+CORPUS_PATH = "data/twitter.pkl"
+
+# threads a batch is split over
+N_WORKERS = BUDGET.workers
+
+# None, "float16" or "int8", see `dcnn.WordEmbeddingLayer`
+EMBEDDING_STORAGE = None
+
+# the uncertainty band of the linear score within which the DCNN is run(see `cascade.py`), 
+# None to run the DCNN on everything
+CASCADE_BAND = None
+
+# bytes the intermediates of a forward pass may take(see `memory_model.py`), 
+# the execution plans kept for later passes included
+MEMORY_BUDGET = 512 * 1024 ** 2
+
+# bytes the execution plans kept by a model may take(see `dcnn.DCNN.plan`), 
+# the larger plans of bulk batches being dropped after use
+PLAN_CACHE_BYTES = MEMORY_BUDGET // 4
+
+# entries of the text and word index levels of the score cache of each predictor(see `result_cache.py`)
+TEXT_CACHE_SIZE = 100000
+WORDS_CACHE_SIZE = 100000
+
+# bytes the weights and vocabularies of the loaded predictors may take together
+REGISTRY_MEMORY_BUDGET = 1024 ** 3
+
+def vocabulary_bytes(word2index):
+    """
+    the memory taken by the vocabulary dictionary, its words and indices
+    """
+    return sys.getsizeof(word2index) + sum(sys.getsizeof(word) + sys.getsizeof(i)
+                                           for word, i in word2index.iteritems())
+
+class Predictor(object):
+    """
+    The sentiment scores of one model
     """
-    word_indices = [get_word_index_array(nltk.word_tokenize(sent), WORD2INDEX)
-                    for sent in sents]
+    def __init__(self, model, word2index, cascade = None, unk_index = None, 
+                 text_cache_size = TEXT_CACHE_SIZE, words_cache_size = WORDS_CACHE_SIZE):
+        """
+        model: dcnn.DCNN
+
+        word2index: dict, the vocabulary of the model
+
+        cascade: cascade.Cascade, in front of `model`, optional
+
+        unk_index: int, the row the words out of the vocabulary are mapped to, 
+           e.g, the `<UNK>` row of a pruned vocabulary(see `prune_vocab.py`); 
+           those words are dropped if None
+        """
+        self.model = model
+        self.word2index = word2index
+        self.padding_index = word2index[u"<PADDING>"]
+        self.unk_index = unk_index
+        self.cascade = cascade
+        self.cache = ResultCache(text_cache_size, words_cache_size)
+
+        # set by the loader
+        self.name = None
+        self.load_time = None
+
+        self.nbytes = model.nbytes + vocabulary_bytes(word2index)
+
+    def word_indices(self, text):
+        """
+        the word indices of the text, as run by the model
+        """
+        return get_word_index_array(word_tokenize(text), self.word2index, self.unk_index)
+
+    def _scores_of_word_indices(self, word_indices, max_batch_size, memory_budget):
+        """
+        the positive scores of sentences in word indices, none being padded: 
+        the `<PADDING>` embedding is trained, not zero, 
+        so a padded sentence would score by what it is run with. 
+        A sentence with no word is scored as the padding alone. 
+
+        The lengths with `max_batch_size` sentences or more are run by full batches of that length, 
+        the other sentences together in packed batches(see `dcnn.DCNN._p_y_given_x_packed`), 
+        so that a request of many lengths takes a few forward passes, not one per length. 
+        The batches are split further if their estimated peak memory exceeds `memory_budget` bytes, 
+        each batch being split over the threads of the model
+        """
+        import numpy as np
+        from memory_model import split_by_budget
+
+        scores = np.empty(len(word_indices), dtype = self.model.dtype)
+
+        word_indices = [sent or [self.padding_index] for sent in word_indices]
+        lengths = [len(sent) for sent in word_indices]
+
+        # the sentences left from full batches, by increasing length
+        rest = []
+        for length_batch in length_buckets(lengths, sorted(set(lengths)), max_batch_size):
+            if max_batch_size and len(length_batch) < max_batch_size:
+                rest.extend(length_batch)
+                continue
+
+            for batch in split_by_budget(length_batch, lengths[length_batch[0]], 
+                                         self.model, memory_budget):
+                x = np.asarray([word_indices[i] for i in batch], dtype = np.int32)
+
+                if self.cascade is not None:
+                    p_y_given_x = self.cascade._p_y_given_x(x, forward = self.model._p_y_given_x_parallel)
+                else:
+                    p_y_given_x = self.model._p_y_given_x_parallel(x)
+
+                scores[batch] = p_y_given_x[:, 1] # `positiveness`
+
+        # a packed sentence takes no more memory than one of its length plus the widest filter gap
+        gap = max(l.W.shape[3] for l in self.model.c_layers) - 1
+
+        for start in xrange(0, len(rest), max_batch_size or max(len(rest), 1)):
+            chunk = rest[start: start + (max_batch_size or len(rest))]
+            for batch in split_by_budget(chunk, lengths[chunk[-1]] + gap, 
+                                         self.model, memory_budget):
+                sents = [np.asarray(word_indices[i], dtype = np.int32) for i in batch]
+
+                if self.cascade is not None:
+                    # the linear model excludes the padding
+                    p_y_given_x, routed = self.cascade.route(pad_sents(sents, self.padding_index))
+                    if len(routed) > 0:
+                        p_y_given_x[routed] = self.model._p_y_given_x_packed_parallel(
+                            [sents[i] for i in routed])
+                else:
+                    p_y_given_x = self.model._p_y_given_x_packed_parallel(sents)
+
+                scores[batch] = p_y_given_x[:, 1]
+
+        return scores
+
+    def scores_of_sents(self, sents, 
+                        max_batch_size = MAX_BATCH_SIZE,
+                        memory_budget = MEMORY_BUDGET,
+                        use_cache = True):
+        """
+        the positive scores of a bunch of sentences, in their order
+
+        The scores are looked up by text then by word indices in the cache, if `use_cache`, 
+        the sentences missing from both being run together(see `_scores_of_word_indices`), 
+        once for each distinct word index sequence. 
+        The cache is locked for the lookups only, the tokenization and the forward pass running outside
+        """
+        import numpy as np
+
+        if not use_cache:
+            word_indices = [self.word_indices(sent) for sent in sents]
+            return self._scores_of_word_indices(word_indices, max_batch_size, memory_budget)
+
+        cache = self.cache
+        scores = np.empty(len(sents), dtype = self.model.dtype)
+
+        # positions of each text missing from the text level
+        missing_texts = OrderedDict()
+        with cache.lock:
+            # the scores of another model or cascade are of no use
+            source = (self.model, self.cascade)
+            cache.validate(source)
+
+            for i, sent in enumerate(sents):
+                score = cache.texts.get(sent)
+                if score is not None:
+                    scores[i] = score
+                else:
+                    missing_texts.setdefault(sent, []).append(i)
+
+        keys = [tuple(self.word_indices(sent)) for sent in missing_texts]
+
+        # positions of the sentences of each word index sequence missing from both levels
+        missing = OrderedDict()
+        with cache.lock:
+            for (sent, positions), key in zip(missing_texts.iteritems(), keys):
+                score = cache.words.get(key)
+                if score is not None:
+                    scores[positions] = score
+                    if cache.source == source:
+                        cache.texts.put(sent, score)
+                else:
+                    missing.setdefault(key, []).extend(positions)
+
+        if missing:
+            missing_scores = self._scores_of_word_indices(map(list, missing.keys()), 
+                                                          max_batch_size, memory_budget)
+            for (key, positions), score in zip(missing.iteritems(), missing_scores):
+                scores[positions] = score
+
+            with cache.lock:
+                # unless the model changed meanwhile
+                if cache.source == source:
+                    for (key, positions), score in zip(missing.iteritems(), missing_scores):
+                        cache.words.put(key, score)
+                        for i in positions:
+                            cache.texts.put(sents[i], score)
+
+        return scores
+
+    def iter_scores(self, texts, 
+                    batch_size = MAX_BATCH_SIZE, 
+                    max_len = None, 
+                    ordered = True,
+                    boundaries = LENGTH_BUCKETS, 
+                    memory_budget = MEMORY_BUDGET):
+        """
+        (index, positive score) of each text of an iterable of any size, 
+        the texts being read, tokenized and scored batch by batch. 
+        A text scores the same in either order and as in `scores_of_sents`, 
+        no sentence being padded(see `_scores_of_word_indices`). 
+        The result cache is not used, not to be filled with texts seen once
+
+        batch_size: int
+           the number of texts scored together
+
+        max_len: int
+           the words of a text beyond it are dropped, None to keep them all
 
-    x = np.asarray(
-        pad_sents(word_indices, PADDING_INDEX), 
-        dtype = np.int32
-    )
+        ordered: bool
+           if True, the scores are in the order of the texts, 
+           each `batch_size` texts being scored together, by length; 
+           otherwise each text waits in the bucket of its length until it has `batch_size` texts, 
+           the batches of each length being larger, 
+           at most `batch_size` texts being held by bucket
+        """
+        if ordered:
+            chunk = []
+            for index, text in enumerate(texts):
+                chunk.append(self.word_indices(text)[:max_len])
+                if len(chunk) == batch_size:
+                    for i, score in enumerate(self._scores_of_word_indices(chunk, batch_size, memory_budget)):
+                        yield index - len(chunk) + 1 + i, score
+                    chunk = []
 
-    scores = MODEL._p_y_given_x(x)
+            if chunk:
+                for i, score in enumerate(self._scores_of_word_indices(chunk, batch_size, memory_budget)):
+                    yield index - len(chunk) + 1 + i, score
+            return
 
-    return scores[:, 1] # return `positiveness`
+        # (indices, word indices) of the texts waiting in each length bucket
+        buckets = [([], []) for i in xrange(len(boundaries) + 1)]
+
+        def flush(indices, word_indices):
+            scores = self._scores_of_word_indices(word_indices, batch_size, memory_budget)
+            pairs = zip(indices, scores)
+            del indices[:], word_indices[:]
+            return pairs
+
+        for index, text in enumerate(texts):
+            words = self.word_indices(text)[:max_len]
+            indices, word_indices = buckets[length_bucket(len(words), boundaries)]
+            indices.append(index)
+            word_indices.append(words)
+
+            if len(indices) == batch_size:
+                for pair in flush(indices, word_indices):
+                    yield pair
+
+        for indices, word_indices in buckets:
+            if indices:
+                for pair in flush(indices, word_indices):
+                    yield pair
+
+    def explain(self, sent):
+        """
+        the positive score and the list of (word, score change) for the words run by the model, 
+        None and an empty list if there is none(see `explain`)
+        """
+        words = word_tokenize(sent)
+        if self.unk_index is None:
+            words = [word for word in words if self.word2index.get(word) is not None]
+        if not words:
+            return None, []
+
+        p_y_given_x, deltas = self.model.explain(get_word_index_array(words, self.word2index, self.unk_index), 
+                                                 self.padding_index)
+        return p_y_given_x[1], zip(words, deltas[:, 1])
+
+    def close(self):
+        self.model.close()
+
+def load_predictor(model_path, corpus_path = CORPUS_PATH):
+    """
+    the predictor of the model file, by the settings above: 
+    from the compiled bundle next to it if there is one(see `bundle.py`), 
+    with the pruned vocabulary next to it if there is one(see `prune_vocab.py`), 
+    the words out of it being mapped to its `<UNK>` row, 
+    the vocabulary of the corpus otherwise
+    """
+    from param_util import load_dcnn_model_params
+    from bundle import (bundle_path, load_bundle)
+    from prune_vocab import (vocab_path, load_vocab, UNK_TOKEN)
+    from dcnn import DCNN
+    from autotune import load_saved_tuning
+    from cascade import (Cascade, cascade_path, load_linear)
+
+    unk_index = None
+
+    # the bundle is memory-mapped, its vocabulary following its reordered embedding rows
+    if os.path.exists(bundle_path(model_path)):
+        params, word2index, _ = load_bundle(bundle_path(model_path))
+    else:
+        params = load_dcnn_model_params(model_path)
+
+        if os.path.exists(vocab_path(model_path)):
+            word2index, params.embeddings = load_vocab(vocab_path(model_path))
+            unk_index = word2index[UNK_TOKEN]
+        else:
+            word2index = load_word2index(corpus_path)
+
+    model = DCNN(params, n_workers = N_WORKERS, embedding_storage = EMBEDDING_STORAGE, 
+                 plan_cache_bytes = PLAN_CACHE_BYTES)
+
+    # convolution algorithms by the tuning file next to the model, if any(see `autotune.py`, run offline)
+    load_saved_tuning(model, model_path)
+
+    if CASCADE_BAND is not None and os.path.exists(cascade_path(model_path)):
+        cascade = Cascade(load_linear(cascade_path(model_path)), model, word2index[u"<PADDING>"], 
+                          band = CASCADE_BAND)
+    else:
+        cascade = None
+
+    return Predictor(model, word2index, cascade, unk_index)
+
+# the files next to the models that are not models
+_DERIVED_SUFFIXES = (".cascade.pkl", ".vocab.pkl")
+
+class PredictorRegistry(object):
+    """
+    The predictors by model name, loaded at their first use. 
+    When their memory exceeds the budget, the least recently used ones are dropped, 
+    the pinned ones and the last one loaded excepted
+    """
+    def __init__(self, models_dir = MODELS_DIR, memory_budget = REGISTRY_MEMORY_BUDGET, 
+                 load = load_predictor):
+        """
+        models_dir: str, where the model named `name` is `name`.pkl
+
+        memory_budget: int, in bytes(see `Predictor.nbytes`)
+
+        load: function from the model path to its `Predictor`
+        """
+        self.models_dir = models_dir
+        self.memory_budget = memory_budget
+        self.load = load
+
+        # by model path, least recently used first
+        self.predictors = OrderedDict()
+        self.pinned = set()
+        # the paths being loaded, each to the event set when done
+        self.loading = {}
+        self.lock = threading.Lock()
+
+    def path(self, name):
+        """
+        the path of the model of the given name, or the name itself if it is a path
+        """
+        if name.endswith(".pkl"):
+            return name
+        return os.path.join(self.models_dir, name + ".pkl")
+
+    def names(self):
+        """
+        the names of the models in the models directory
+        """
+        return sorted(os.path.splitext(f)[0] for f in os.listdir(self.models_dir)
+                      if f.endswith(".pkl") and not f.endswith(_DERIVED_SUFFIXES))
+
+    def get(self, name, pin = False):
+        """
+        the predictor of the model, loaded if not already. 
+        A pinned predictor is never dropped.
+
+        The model is loaded outside the lock, so that the loaded predictors are served meanwhile, 
+        the other callers asking for the same model waiting for that load
+        """
+        path = self.path(name)
+        while True:
+            with self.lock:
+                predictor = self.predictors.pop(path, None)
+                if predictor is not None:
+                    self._add(path, predictor, pin)
+                    return predictor
+
+                loaded = self.loading.get(path)
+                if loaded is None:
+                    loaded = self.loading[path] = threading.Event()
+                    break
+
+            # loaded by another caller, or failed to, then tried again
+            loaded.wait()
+
+        predictor = None
+        try:
+            start = time.time()
+            predictor = self.load(path)
+            predictor.name = os.path.splitext(os.path.basename(path))[0]
+            predictor.load_time = time.time() - start
+        finally:
+            with self.lock:
+                del self.loading[path]
+                if predictor is not None:
+                    self._add(path, predictor, pin)
+            loaded.set()
+
+        return predictor
+
+    def _add(self, path, predictor, pin):
+        """
+        put the predictor as the most recently used one, then drop the others over the budget
+        """
+        self.predictors[path] = predictor
+        if pin:
+            self.pinned.add(path)
+        self._evict()
+
+    def nbytes(self):
+        return sum(p.nbytes for p in self.predictors.itervalues())
+
+    def _evict(self):
+        """
+        drop the least recently used predictors over the budget, 
+        whose thread pools stop once the calls still running on them are done(see `dcnn.DCNN.close`)
+        """
+        for path in self.predictors.keys()[:-1]:
+            if self.nbytes() <= self.memory_budget:
+                break
+            if path not in self.pinned:
+                self.predictors.pop(path).close()
+
+    def loaded(self):
+        """
+        the loaded predictors, least recently used first
+        """
+        with self.lock:
+            return self.predictors.values()
+
+    def describe(self):
+        """
+        the memory and load time of each loaded predictor, least recently used first
+        """
+        predictors = self.loaded()
+        nbytes = sum(p.nbytes for p in predictors)
+
+        lines = ["%s: %.1f MB, loaded in %.0f ms" %(p.name, p.nbytes / 1024. ** 2, p.load_time * 1000)
+                 for p in predictors]
+        lines.append("%d predictors, %.1f MB of %.1f MB" %(
+            len(predictors), nbytes / 1024. ** 2, self.memory_budget / 1024. ** 2))
+        return "\n".join(lines)
+
+REGISTRY = PredictorRegistry()
+
+def default_predictor():
+    """
+    the predictor of `MODEL_PATH`, pinned in `REGISTRY`
+    """
+    return REGISTRY.get(MODEL_PATH, pin = True)
+
+def warm_up():
+    """
+    Load the default predictor, for the first prediction not to wait for it
+    """
+    default_predictor()
+
+def sentiment_scores_of_sents(sents, 
+                              max_batch_size = MAX_BATCH_SIZE,
+                              memory_budget = MEMORY_BUDGET,
+                              use_cache = True):
+    """
+    Predict the sentiment positive scores for a bunch of sentences, 
+    by the default predictor(see `Predictor.scores_of_sents`)
+    
+    >>> scores = sentiment_scores_of_sents([u'simultaneously heart breaking and very funny , the last kiss is really all about performances .', u'( u ) stupid .'])
+    >>> scores[0] > 0.5, scores[1] < 0.5
+    (True, True)
+    """
+    return default_predictor().scores_of_sents(sents, max_batch_size, memory_budget, use_cache)
 
 
 def sentiment_score(sent):
     """simple wrapper around the more general case"""
     return sentiment_scores_of_sents([sent])[0]
+
+
+def iter_sentiment_scores(texts, batch_size = MAX_BATCH_SIZE, max_len = None, ordered = True):
+    """
+    (index, positive score) of each text of an iterable, e.g, the lines of a tweet dump, 
+    read and scored batch by batch with the default predictor(see `Predictor.iter_scores`)
+
+    >>> list(iter_sentiment_scores(iter([u'what a great day', u'so sad', u'what a great day']), batch_size = 2))[2][0]
+    2
+    """
+    return default_predictor().iter_scores(texts, batch_size, max_len, ordered)
+
+
+def explain(sent):
+    """
+    Which words drove the score: 
+    how much the positive score drops when each word is replaced by the padding, 
+    all occlusions being run as one batch(see `dcnn.DCNN.explain`)
+
+    Returns:
+    the positive score and the list of (word, score change) for the words of the vocabulary, 
+    None and an empty list if there is none
+    """
+    return default_predictor().explain(sent)
+
+
+class TypingSession(object):
+    """
+    Live sentiment score of a text being typed, 
+    each call recomputing only the convolution columns the edit touches(see `incremental.py`)
+    """
+    def __init__(self, predictor = None):
+        """
+        predictor: Predictor, the default one if not given
+        """
+        from incremental import IncrementalSession
+
+        self._predictor = predictor or default_predictor()
+        self._session = IncrementalSession(self._predictor.model)
+
+    def score(self, text):
+        """
+        the positive score of the current text, None if it has no known word
+        """
+        words = self._predictor.word_indices(text)
+        if not words:
+            return None
+        return self._session.p_y_given_x(words)[0, 1]
@@ -0,0 +1,70 @@
+import os, tempfile
+import numpy as np
+
+from dcnn import DCNN
+from autotune import (tune, apply_tuning, save_tuning, tuning_path, load_saved_tuning)
+
+from test_util import (assert_matrix_close, random_params)
+
+rng = np.random.RandomState(1234)
+
+vocab_size, embed_dm = 50, 8
+
+p = random_params(rng, vocab_size, embed_dm)
+
+x = np.asarray(rng.randint(vocab_size, size = (4, 9)), dtype = np.int32)
+expected = DCNN(p, plan_cache_size = 0)._p_y_given_x(x)
+
+########## dispatch by the tables ##########
+
+conv_tables = [[(1, 10, "scipy"), (100, 10, "gemm"), (100, 80, "fft")],
+               [(1, 10, "fft"), (100, 80, "scipy")]]
+
+model = DCNN(p)
+model._p_y_given_x(x)
+assert model.plan(4, 9).layer_plans[0].conv_algo == "gemm"
+
+apply_tuning(model, conv_tables)
+
+l1, l2 = model.c_layers
+assert l1.select_conv_algo(1, 9) == "scipy"
+assert l1.select_conv_algo(50, 12) == "gemm"
+assert l1.select_conv_algo(80, 70) == "fft"
+assert l2.select_conv_algo(2, 8) == "fft"
+
+# the plans made before are dropped
+assert model.plan(4, 9).layer_plans[0].conv_algo == "scipy"
+
+assert_matrix_close(model._p_y_given_x(x), expected, "Forward pass by the tuned algorithms")
+
+########## saved and loaded ##########
+
+model_path = os.path.join(tempfile.mkdtemp(), "model.pkl")
+
+model = DCNN(p)
+assert load_saved_tuning(model, model_path) is None, "no tuning file, nothing loaded"
+assert all(l.conv_table is None for l in model.c_layers)
+
+save_tuning(conv_tables, tuning_path(model_path))
+assert load_saved_tuning(model, model_path) == [map(list, conv_table) for conv_table in conv_tables]
+assert [l.conv_table for l in model.c_layers] == conv_tables
+
+# unreadable, the default algorithms kept
+with open(tuning_path(model_path), "w") as f:
+    f.write("{")
+model = DCNN(p)
+assert load_saved_tuning(model, model_path) is None
+assert all(l.conv_table is None for l in model.c_layers)
+
+########## tuning ##########
+
+model = DCNN(p)
+conv_tables = tune(model, batch_sizes = (1, 3), lengths = (5, ), repeat = 1)
+
+assert [[(batch_size, width) for batch_size, width, conv_algo in conv_table]
+        for conv_table in conv_tables] == [[(1, 5), (3, 5)], [(1, 5), (3, 5)]]
+assert all(conv_algo in ("gemm", "fft", "scipy")
+           for conv_table in conv_tables for batch_size, width, conv_algo in conv_table)
+
+# the layers are left as they were
+assert [(l.conv_algo, l.conv_table) for l in model.c_layers] == [("gemm", None), ("gemm", None)]
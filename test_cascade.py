@@ -0,0 +1,69 @@
+import numpy as np
+
+from dcnn import (DCNN, LogisticRegression)
+from cascade import (Cascade, bag_of_embeddings, train_linear)
+
+from test_util import (assert_matrix_close, random_params)
+
+rng = np.random.RandomState(1234)
+
+vocab_size, embed_dm = 50, 8
+padding_index = vocab_size - 1
+
+p = random_params(rng, vocab_size, embed_dm)
+p.embeddings -= 0.5
+
+model = DCNN(p, dtype = np.float64)
+
+x = np.asarray(rng.randint(vocab_size - 1, size = (40, 9)), dtype = np.int32)
+x[::2, 6:] = padding_index
+
+########## bag of embeddings ##########
+
+features = bag_of_embeddings(model.e_layer, x, padding_index)
+assert_matrix_close(features[0], p.embeddings[x[0, :6]].mean(axis = 0), "Bag of embeddings, padded")
+assert_matrix_close(features[1], p.embeddings[x[1]].mean(axis = 0), "Bag of embeddings")
+
+########## training on separable labels ##########
+
+y = (features[:, 0] > np.median(features[:, 0])).astype(np.int32)
+linear = train_linear(features, y, l2_reg = 0)
+assert (linear.predict(features) == y).all()
+
+########## routing ##########
+
+cascade = Cascade(linear, model, padding_index, band = (0.3, 0.7))
+actual = cascade._p_y_given_x(x)
+
+linear_p = linear._p_y_given_x(features)
+routed = (linear_p[:, 1] >= 0.3) & (linear_p[:, 1] <= 0.7)
+
+assert cascade.n_routed == routed.sum()
+assert_matrix_close(actual[routed], model._p_y_given_x(x[routed]), "Routed to the DCNN")
+assert_matrix_close(actual[~routed], linear_p[~routed], "Scored by the linear model")
+
+cascade = Cascade(linear, model, padding_index, band = (0, 1))
+assert_matrix_close(cascade._p_y_given_x(x), model._p_y_given_x(x), "Everything routed")
+
+########## sentences of mixed lengths, as run by the predictor ##########
+
+from sentiment import Predictor
+
+word2index = dict((u"w%d" %(i), i) for i in xrange(vocab_size - 1))
+word2index[u"<PADDING>"] = padding_index
+
+# some sentences routed, some not
+band = (1e-20, 0.99)
+cascade = Cascade(linear, model, padding_index, band = band)
+predictor = Predictor(model, word2index, cascade)
+
+sents = [rng.randint(vocab_size - 1, size = length) for length in (3, 9, 5, 9, 12, 4, 7, 9, 2, 6)]
+texts = [u" ".join(u"w%d" %(i) for i in sent) for sent in sents]
+
+alone = np.concatenate([Cascade(linear, model, padding_index, band = band)
+                        ._p_y_given_x(np.asarray([sent], dtype = np.int32))[:, 1]
+                        for sent in sents])
+# the full batch of length 9 and the packed batch of the others
+assert_matrix_close(predictor.scores_of_sents(texts, max_batch_size = 3, use_cache = False), alone, 
+                    "Cascade, mixed lengths")
+assert cascade.n_sentences == len(sents) and 0 < cascade.n_routed < len(sents), cascade.n_routed
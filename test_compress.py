@@ -0,0 +1,42 @@
+import numpy as np
+
+from dcnn import DCNN
+from compress import (prune_params, factorize_logreg)
+
+from test_util import (assert_matrix_close, random_params)
+
+rng = np.random.RandomState(1234)
+
+vocab_size, embed_dm = 50, 8
+
+p = random_params(rng, vocab_size, embed_dm, nkerns = (4, 4))
+
+# filters with zero weights and bias output zeros, 
+# so pruning them changes nothing
+p.W[0][[1, 3]] = 0
+p.b[0][[1, 3]] = 0
+p.W[1][[0, 2]] = 0
+p.b[1][[0, 2]] = 0
+
+x = np.asarray(rng.randint(vocab_size, size = (4, 9)), dtype = np.int32)
+expected = DCNN(p)._p_y_given_x(x)
+
+pruned = prune_params(p, 0.5)
+assert [W.shape[:2] for W in pruned.W] == [(2, 1), (2, 2)], [W.shape for W in pruned.W]
+assert pruned.logreg_W.shape == (2 * 3 * embed_dm / 2, 2)
+
+assert_matrix_close(DCNN(pruned)._p_y_given_x(x),
+                    expected,
+                    "Forward pass with zero filters pruned")
+
+########## output layer of rank 1 ##########
+
+p.logreg_W = np.outer(rng.rand(p.logreg_W.shape[0]), rng.rand(2))
+expected = DCNN(p)._p_y_given_x(x)
+
+factored = factorize_logreg(p, 1)
+assert factored.logreg_V.shape == (1, 2)
+
+assert_matrix_close(DCNN(factored)._p_y_given_x(x),
+                    expected,
+                    "Forward pass with the output layer factored")
@@ -0,0 +1,42 @@
+import numpy as np
+
+from dcnn import DCNN
+from incremental import IncrementalSession
+from autotune import apply_tuning
+
+from test_util import (assert_matrix_close, random_params)
+
+rng = np.random.RandomState(1234)
+
+vocab_size, embed_dm = 50, 8
+
+p = random_params(rng, vocab_size, embed_dm, ks = (12, 3))
+
+model = DCNN(p)
+session = IncrementalSession(model)
+
+words = rng.randint(vocab_size, size = 14)
+
+########## typing, then deleting and editing ##########
+
+lengths = range(1, 15) + [10, 11]
+
+def type_words(session, name):
+    for n in lengths:
+        sent = words[:n].copy()
+        if n == 11:
+            sent[-1] = (sent[-1] + 1) % vocab_size
+        assert_matrix_close(session.p_y_given_x(sent),
+                            model._p_y_given_x(sent[np.newaxis, :].astype(np.int32)),
+                            "%s, %d words" %(name, n))
+
+    assert session.reused_columns > 0
+    print "%d columns computed, %d reused" %(session.computed_columns, session.reused_columns)
+
+type_words(session, "Incremental forward pass")
+
+########## the prefix and the tail convolved by different algorithms ##########
+
+apply_tuning(model, [[(1, 1, "fft"), (1, 6, "gemm"), (1, 14, "scipy")],
+                     [(1, 1, "scipy"), (1, 12, "fft")]])
+type_words(IncrementalSession(model), "Incremental forward pass, tuned algorithms")
@@ -0,0 +1,54 @@
+import numpy as np
+
+from dcnn import (DCNN, ExecutionPlan)
+from memory_model import (estimate_bytes, fit_batch_size, split_by_budget)
+
+from test_util import random_params
+
+rng = np.random.RandomState(1234)
+
+vocab_size, embed_dm = 50, 8
+
+p = random_params(rng, vocab_size, embed_dm)
+
+########## the estimate against the buffers of the plan ##########
+
+def plan_bytes(plan):
+    arrays = [plan.embedding_out, plan.flat_index, plan.gathered]
+    for layer_plan in plan.layer_plans:
+        arrays += [getattr(layer_plan, name, None)
+                   for name in ("padded", "unrolled", "conv_out", "fold_out", "pool_out_flat",
+                                "partitioned", "selected", "ties", "positions", "row_offsets")]
+    return sum(a.nbytes for a in arrays if a is not None)
+
+for storage in (None, "int8"):
+    model = DCNN(p, embedding_storage = storage)
+    for batch_size, length in [(1, 2), (7, 9), (30, 4)]:
+        estimated = dict(estimate_bytes(model, batch_size, length))
+        planned = sum(nbytes for name, nbytes in estimated.items()
+                      if name not in ("input", "p_y_given_x"))
+        
+        plan = ExecutionPlan(model, batch_size, length)
+        assert planned == plan_bytes(plan) == plan.nbytes, \
+            "%r: %d != %d" %((storage, batch_size, length), planned, plan_bytes(plan))
+
+print "Estimate against plan buffers: OK"
+
+########## batch sizing ##########
+
+model = DCNN(p)
+per_sentence = sum(nbytes for name, nbytes in estimate_bytes(model, 1, 9))
+
+assert fit_batch_size(model, 9, per_sentence * 10.5) == 10
+assert fit_batch_size(model, 9, 1) == 1
+
+chunks = split_by_budget(np.arange(25), 9, model, per_sentence * 10)
+assert [len(chunk) for chunk in chunks] == [10, 10, 5]
+
+# the plans kept by the model taking their part of the budget
+plan = model.plan(2, 9)
+assert model.plan_bytes() == plan.nbytes
+chunks = split_by_budget(np.arange(25), 9, model, per_sentence * 10 + plan.nbytes)
+assert [len(chunk) for chunk in chunks] == [10, 10, 5]
+
+print "Batch sizing: OK"
@@ -0,0 +1,54 @@
+import os, tempfile
+import numpy as np
+
+from dcnn import DCNN
+from bundle import (compile_model, load_bundle)
+
+from test_util import (assert_matrix_close, random_params)
+
+rng = np.random.RandomState(1234)
+
+vocab_size, embed_dm = 50, 8
+
+p = random_params(rng, vocab_size, embed_dm)
+
+word2index = dict((u"word%d" %(i), i) for i in xrange(vocab_size))
+counts = rng.randint(100, size = vocab_size)
+
+path = os.path.join(tempfile.mkdtemp(), "model.bundle")
+
+x = np.asarray(rng.randint(vocab_size, size = (4, 9)), dtype = np.int32)
+expected = DCNN(p)._p_y_given_x(x)
+
+########## rows reordered by frequency ##########
+
+compile_model(p, word2index, path, counts = counts)
+bundle_p, bundle_word2index, header = load_bundle(path)
+
+assert not header["dropout_scaled"]
+assert bundle_word2index[u"word%d" %(np.argmax(counts))] == 0, "the most frequent word should come first"
+
+remapped = np.vectorize(lambda i: bundle_word2index[u"word%d" %(i)])(x).astype(np.int32)
+
+model = DCNN(bundle_p)
+assert_matrix_close(model._p_y_given_x(remapped),
+                    expected,
+                    "Bundle forward pass")
+
+assert_matrix_close(model._p_y_given_x_packed(list(remapped)),
+                    expected,
+                    "Bundle packed forward pass")
+
+assert np.may_share_memory(model.c_layers[0]._filters_mat, bundle_p.W[0]), "the filter matrix should be a view of the bundle"
+
+for entry in header["arrays"]:
+    assert entry["offset"] % 4096 == 0, "%s not page-aligned" %(entry["name"])
+
+########## dropout scaling ##########
+
+compile_model(p, word2index, path, dropout_rates = [0.5, 0.2])
+bundle_p, bundle_word2index, header = load_bundle(path)
+
+assert header["dropout_scaled"]
+assert_matrix_close(bundle_p.W[1], p.W[1] * 0.8, "Scaled filters")
+assert_matrix_close(bundle_p.logreg_W, p.logreg_W * 0.8, "Scaled logistic regression weights")
@@ -0,0 +1,33 @@
+import numpy as np
+
+from numpy_impl import (conv2d, conv1d_gemm)
+from dcnn import ConvFoldingPoolLayer
+
+from test_util import assert_matrix_close
+
+input_feature_map = np.random.rand(10, 7, 24, 13)
+filters = np.random.rand(12, 7, 1, 6)
+
+assert_matrix_close(conv1d_gemm(input_feature_map, filters),
+                    conv2d(input_feature_map, filters),
+                    "GEMM conv1d")
+
+# single word, filter wider than the sentence
+input_feature_map = np.random.rand(2, 1, 48, 1)
+filters = np.random.rand(7, 1, 1, 8)
+
+assert_matrix_close(conv1d_gemm(input_feature_map, filters),
+                    conv2d(input_feature_map, filters),
+                    "GEMM conv1d, single word")
+
+# the layer picks the GEMM path for height-1 filters
+layer = ConvFoldingPoolLayer(k = 5,
+                             fold = 1,
+                             W = filters,
+                             b = np.random.rand(7))
+assert layer.conv_algo == "gemm"
+
+x = np.random.rand(3, 1, 48, 9)
+assert_matrix_close(layer.conv(x),
+                    conv2d(x, filters),
+                    "Layer GEMM conv1d")
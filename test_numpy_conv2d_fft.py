@@ -0,0 +1,43 @@
+import numpy as np
+
+from numpy_impl import (conv2d, conv2d_fft)
+from dcnn import ConvFoldingPoolLayer
+
+from test_util import assert_matrix_close
+
+########################
+# 2d filters #
+########################
+
+input_feature_map = np.random.rand(3, 2, 5, 7)
+filters = np.random.rand(4, 2, 2, 3)
+
+assert_matrix_close(conv2d_fft(input_feature_map, filters),
+                    conv2d(input_feature_map, filters),
+                    "FFT conv2d")
+
+########################
+# height-1 filters(as in DCNN) #
+########################
+
+input_feature_map = np.random.rand(10, 7, 24, 13)
+filters = np.random.rand(12, 7, 1, 6)
+
+assert_matrix_close(conv2d_fft(input_feature_map, filters),
+                    conv2d(input_feature_map, filters),
+                    "FFT conv2d, height-1 filters")
+
+########################
+# the layer, with cached filter spectrum #
+########################
+
+layer = ConvFoldingPoolLayer(k = 5,
+                             fold = 1,
+                             W = filters,
+                             b = np.random.rand(12))
+
+for length in (13, 11, 13):
+    x = np.random.rand(10, 7, 24, length)
+    assert_matrix_close(layer.conv(x),
+                        conv2d(x, filters),
+                        "Layer FFT conv2d, length %d" %(length))
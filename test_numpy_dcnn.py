@@ -104,7 +104,7 @@ p.b = [b]
 p.W_logreg = W_logreg
 p.b_logreg = b_logreg
 
-dcnn = DCNN(p)
+dcnn = DCNN(p, dtype = theano.config.floatX)
 
 ##################### Testing ####################
 
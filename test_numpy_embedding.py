@@ -2,7 +2,7 @@ import theano
 import numpy as np
 from dcnn import WordEmbeddingLayer
 from dcnn_train import WordEmbeddingLayer as TheanoWordEmbeddingLayer
-from test_util import assert_matrix_eq
+from test_util import (assert_matrix_eq, assert_matrix_close)
 ########### NUMPY ###########
 
 vocab_size, embed_dm = 10, 5
@@ -35,3 +35,10 @@ expected = f(sents)
 
 assert_matrix_eq(actual, expected, "Embedding")
 
+
+########### INTO A GIVEN BUFFER ###########
+
+buf = np.empty((3, 1, embed_dm, 6))
+assert np_l.output(sents, out = buf) is buf
+
+assert_matrix_close(buf, expected, "Embedding into buffer")
@@ -0,0 +1,51 @@
+import numpy as np
+
+from dcnn import (WordEmbeddingLayer, DCNN)
+from numpy_impl import quantize_rows
+
+from test_util import (assert_matrix_close, random_params)
+
+rng = np.random.RandomState(1234)
+
+vocab_size, embed_dm = 50, 8
+embeddings = rng.rand(vocab_size, embed_dm) - 0.5
+sents = np.asarray(rng.randint(vocab_size, size = (3, 6)), dtype = np.int32)
+
+def gather(table, x):
+    return table[x].transpose((0, 2, 1))[:, np.newaxis]
+
+########## float16 ##########
+
+l = WordEmbeddingLayer(embeddings, storage = "float16")
+assert l.output(sents).dtype == embeddings.dtype
+
+assert_matrix_close(l.output(sents),
+                    gather(embeddings.astype(np.float16).astype(np.float64), sents),
+                    "float16 embedding")
+
+########## int8 ##########
+
+q, scales = quantize_rows(embeddings, dtype = np.float64)
+assert (np.abs(q * scales[:, np.newaxis] - embeddings) <= scales[:, np.newaxis] / 2 + 1e-12).all()
+
+l = WordEmbeddingLayer(embeddings, storage = "int8")
+assert l.nbytes == vocab_size * (embed_dm + 8)
+
+dequantized = q * scales[:, np.newaxis]
+assert_matrix_close(l.output(sents),
+                    gather(dequantized, sents),
+                    "int8 embedding")
+
+########## the model, with plans ##########
+
+p = random_params(rng, vocab_size, embed_dm)
+p.embeddings = embeddings
+
+model = DCNN(p, embedding_storage = "int8")
+p.embeddings = dequantized.astype(np.float32) 
+expected = DCNN(p)._p_y_given_x(sents)
+
+for i in xrange(2):
+    assert_matrix_close(model._p_y_given_x(sents),
+                        expected,
+                        "Forward pass with int8 embedding, run %d" %(i + 1))
@@ -0,0 +1,109 @@
+import threading
+import numpy as np
+
+from dcnn import (DCNN, ConvFoldingPoolLayer, LayerPlan, ExecutionPlan)
+
+from test_util import (assert_matrix_close, random_params)
+
+rng = np.random.RandomState(1234)
+
+vocab_size, embed_dm = 50, 8
+
+p = random_params(rng, vocab_size, embed_dm)
+
+planned = DCNN(p, plan_cache_size = 2)
+unplanned = DCNN(p, plan_cache_size = 0)
+
+########## same results, repeated shapes and LRU eviction ##########
+
+for batch_size, length in [(3, 6), (3, 6), (1, 2), (4, 9), (3, 6), (1, 2)]:
+    x = np.asarray(rng.randint(vocab_size, size = (batch_size, length)),
+                   dtype = np.int32)
+    assert_matrix_close(planned._p_y_given_x(x),
+                        unplanned._p_y_given_x(x),
+                        "Planned forward pass, shape %r" %((batch_size, length), ))
+
+assert len(planned._thread_local.cache.plans) == 2
+
+x = np.asarray(rng.randint(vocab_size, size = (3, 6)), dtype = np.int32)
+plan = planned.plan(3, 6)
+assert planned.plan(3, 6) is plan, "the plan should be reused"
+
+########## k-max pooling with ties into the plan buffers ##########
+
+layer = ConvFoldingPoolLayer(k = 4, fold = 0,
+                             W = rng.rand(3, 2, 1, 2),
+                             b = rng.rand(3))
+fold_out = np.asarray(rng.randint(3, size = (2, 3, 5, 7)), dtype = np.float64)
+layer_plan = LayerPlan(layer, (2, 2, 5, 6), np.float64)
+np.copyto(layer_plan.fold_out, fold_out)
+
+assert_matrix_close(layer.k_max_pool(layer_plan.fold_out, 4, layer_plan),
+                    layer.k_max_pool(fold_out, 4),
+                    "k-max pool into plan buffers, with ties")
+
+########## concurrent callers ##########
+
+xs = [np.asarray(rng.randint(vocab_size, size = (5, 7)), dtype = np.int32)
+      for i in xrange(4)]
+expected = [unplanned._p_y_given_x(x) for x in xs]
+actual = [None] * len(xs)
+
+def worker(i):
+    for j in xrange(20):
+        actual[i] = planned._p_y_given_x(xs[i])
+
+threads = [threading.Thread(target = worker, args = (i, ))
+           for i in xrange(len(xs))]
+for t in threads:
+    t.start()
+for t in threads:
+    t.join()
+
+for i in xrange(len(xs)):
+    assert_matrix_close(actual[i], expected[i], "Thread %d" %(i))
+
+########## batch split over the thread pool ##########
+
+parallel = DCNN(p, n_workers = 3, min_shard_size = 2)
+
+for batch_size in (1, 5, 7, 40):
+    x = np.asarray(rng.randint(vocab_size, size = (batch_size, 6)), dtype = np.int32)
+    assert_matrix_close(parallel._p_y_given_x_parallel(x),
+                        unplanned._p_y_given_x(x),
+                        "Parallel forward pass, batch size %d" %(batch_size))
+
+########## plans bounded by bytes ##########
+
+def plan_size(batch_size, length):
+    return ExecutionPlan(unplanned, batch_size, length).nbytes
+
+bounded = DCNN(p, plan_cache_bytes = plan_size(3, 6) + plan_size(1, 2))
+cached_shapes = lambda: bounded._thread_local.cache.plans.keys()
+
+bounded.plan(3, 6)
+bounded.plan(1, 2)
+assert bounded.plan_bytes() == bounded.plan_cache_bytes
+
+# the least recently used plan dropped for the new one
+bounded.plan(2, 6)
+assert cached_shapes() == [(1, 2), (2, 6)]
+assert bounded.plan_bytes() == plan_size(1, 2) + plan_size(2, 6)
+
+# larger than the bound: used, not kept, the others kept
+large = bounded.plan(40, 9)
+assert large.nbytes > bounded.plan_cache_bytes
+assert bounded.plan(40, 9) is not large
+assert cached_shapes() == [(1, 2), (2, 6)]
+
+# the plans of the other threads count
+other_bytes = []
+def plan_in_thread():
+    bounded.plan(3, 6)
+    other_bytes.append(bounded.plan_bytes())
+
+t = threading.Thread(target = plan_in_thread)
+t.start()
+t.join()
+assert other_bytes == [plan_size(1, 2) + plan_size(2, 6)], "no room left for the plan of the other thread"
+assert cached_shapes() == [(1, 2), (2, 6)]
@@ -0,0 +1,28 @@
+import numpy as np
+
+from dcnn import DCNN
+
+from test_util import (assert_matrix_close, random_params)
+
+rng = np.random.RandomState(1234)
+
+vocab_size, embed_dm = 50, 8
+padding_index = vocab_size - 1
+
+p = random_params(rng, vocab_size, embed_dm)
+
+words = np.asarray(rng.randint(vocab_size - 1, size = 12), dtype = np.int32)
+
+for plan_cache_size in (8, 0):
+    model = DCNN(p, plan_cache_size = plan_cache_size)
+    p_y_given_x, deltas = model.explain(words, padding_index)
+
+    assert_matrix_close(p_y_given_x, model._p_y_given_x(words[np.newaxis, :])[0], 
+                        "Sentence probabilities, plan cache %d" %(plan_cache_size))
+
+    # one forward pass per occlusion
+    occluded = np.repeat(words[np.newaxis, :], len(words), axis = 0)
+    occluded[np.arange(len(words)), np.arange(len(words))] = padding_index
+    expected = p_y_given_x - model._p_y_given_x(occluded)
+
+    assert_matrix_close(deltas, expected, "Occlusion deltas, plan cache %d" %(plan_cache_size))
@@ -0,0 +1,35 @@
+import numpy as np
+
+from dcnn import ConvFoldingPoolLayer
+
+from test_util import assert_matrix_close
+
+def argsort_k_max_pool(x, k):
+    """the reference: the tail of a stable argsort, put back in the original order"""
+    ind = np.sort(np.argsort(x, axis = 3, kind = "mergesort")[:, :, :, -k:], axis = 3)
+    
+    dim0, dim1, dim2, dim3 = ind.shape
+    return x[np.arange(dim0)[:, None, None, None],
+             np.arange(dim1)[None, :, None, None],
+             np.arange(dim2)[None, None, :, None],
+             ind]
+
+layer = ConvFoldingPoolLayer(k = 5,
+                             fold = 1,
+                             W = np.random.rand(3, 1, 1, 2),
+                             b = np.random.rand(3))
+
+x = np.random.rand(10, 7, 24, 27)
+
+for k in (1, 5, 20, 27, 30):
+    assert_matrix_close(layer.k_max_pool(x, k),
+                        argsort_k_max_pool(x, k),
+                        "k-max pool, k = %d" %(k))
+
+# ties, as given by padding columns
+x = np.random.randint(4, size = (10, 7, 24, 27)).astype(np.float64)
+
+for k in (1, 5, 20):
+    assert_matrix_close(layer.k_max_pool(x, k),
+                        argsort_k_max_pool(x, k),
+                        "k-max pool with ties, k = %d" %(k))
@@ -0,0 +1,34 @@
+import numpy as np
+
+from dcnn import DCNN
+
+from test_util import (assert_matrix_close, random_params)
+
+rng = np.random.RandomState(1234)
+
+vocab_size, embed_dm = 50, 8
+
+p = random_params(rng, vocab_size, embed_dm)
+
+model = DCNN(p, dtype = np.float64)
+
+sents = [np.asarray(rng.randint(vocab_size, size = length), dtype = np.int32)
+         for length in (1, 7, 3, 12, 7, 2)]
+
+actual = model._p_y_given_x_packed(sents)
+
+########## against each sentence alone ##########
+expected = np.concatenate([model._p_y_given_x(sent[np.newaxis, :])
+                           for sent in sents])
+assert_matrix_close(actual, expected, "Packed vs one by one")
+
+########## against the padded path, for sentences of the same length ##########
+same_length = [sents[1], sents[4]]
+assert_matrix_close(model._p_y_given_x_packed(same_length), 
+                    model._p_y_given_x(np.vstack(same_length)),
+                    "Packed vs padded")
+
+########## split over threads ##########
+parallel_model = DCNN(p, dtype = np.float64, n_workers = 3, min_shard_size = 1)
+assert_matrix_close(parallel_model._p_y_given_x_packed_parallel(sents), expected, "Packed over threads")
+parallel_model.close()
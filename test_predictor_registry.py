@@ -0,0 +1,118 @@
+import numpy as np
+
+from dcnn import DCNN
+from sentiment import (Predictor, PredictorRegistry)
+
+from test_util import (assert_matrix_close, random_params)
+
+rng = np.random.RandomState(1234)
+
+vocab_size, embed_dm = 20, 8
+
+words = [u"good", u"bad", u"movie", u"very", u"."]
+word2index = dict((word, i) for i, word in enumerate(words))
+word2index[u"<PADDING>"] = vocab_size - 1
+
+########## scores as the model's ##########
+
+model = DCNN(random_params(rng, vocab_size, embed_dm))
+predictor = Predictor(model, word2index)
+
+sents = [u"very good movie .", u"bad movie", u"very good movie ."]
+expected = np.concatenate([model._p_y_given_x(np.asarray([sent], dtype = np.int32))[:, 1]
+                           for sent in ([3, 0, 2, 4], [1, 2])])
+
+assert_matrix_close(predictor.scores_of_sents(sents, use_cache = False), expected[[0, 1, 0]],
+                    "Scores without cache")
+assert_matrix_close(predictor.scores_of_sents(sents), expected[[0, 1, 0]],
+                    "Scores with cache")
+
+assert predictor.nbytes > model.nbytes > model.e_layer.nbytes
+
+########## least recently used predictors dropped ##########
+
+loaded = []
+def load(path):
+    loaded.append(path)
+    return Predictor(DCNN(random_params(rng, vocab_size, embed_dm)), word2index)
+
+registry = PredictorRegistry("models", memory_budget = int(predictor.nbytes * 2.5), load = load)
+
+a = registry.get("a", pin = True)
+b = registry.get("b")
+assert registry.get("a") is registry.get("models/a.pkl") is a
+assert loaded == ["models/a.pkl", "models/b.pkl"]
+
+# b, the least recently used unpinned one, is dropped
+c = registry.get("c")
+assert [p.name for p in registry.predictors.values()] == ["a", "c"]
+
+# a is pinned
+registry.get("b")
+assert [p.name for p in registry.predictors.values()] == ["a", "b"]
+assert loaded == ["models/a.pkl", "models/b.pkl", "models/c.pkl", "models/b.pkl"]
+
+assert registry.nbytes() <= registry.memory_budget
+assert all(p.load_time >= 0 for p in registry.predictors.values())
+assert registry.path("models/x.pkl") == "models/x.pkl"
+assert [p.name for p in registry.loaded()] == ["a", "b"]
+
+########## loaded predictors served during a load ##########
+
+import threading
+
+started, release = threading.Event(), threading.Event()
+slow_loads = []
+def slow_load(path):
+    if path.endswith("slow.pkl"):
+        slow_loads.append(path)
+        started.set()
+        release.wait()
+    return Predictor(DCNN(random_params(rng, vocab_size, embed_dm)), word2index)
+
+registry = PredictorRegistry("models", memory_budget = int(predictor.nbytes * 10), load = slow_load)
+a = registry.get("a")
+
+results = []
+threads = [threading.Thread(target = lambda: results.append(registry.get("slow")))
+           for i in xrange(2)]
+for t in threads:
+    t.start()
+started.wait()
+
+assert registry.get("a") is a, "served while another model loads"
+
+release.set()
+for t in threads:
+    t.join()
+assert slow_loads == ["models/slow.pkl"], "loaded once"
+assert results[0] is results[1]
+
+# a failed load is tried again
+def failing_load(path):
+    raise IOError(path)
+
+registry = PredictorRegistry("models", load = failing_load)
+for i in xrange(2):
+    try:
+        registry.get("a")
+        assert False
+    except IOError:
+        pass
+assert registry.loading == {} and registry.loaded() == []
+
+########## a dropped model's pool stopped once not in use ##########
+
+model = DCNN(random_params(rng, vocab_size, embed_dm), n_workers = 2, min_shard_size = 1)
+x = np.asarray(rng.randint(vocab_size, size = (4, 6)), dtype = np.int32)
+expected = model._p_y_given_x_parallel(x)
+
+pool = model.acquire_pool()
+model.close()
+assert model._pool is pool, "in use"
+model.release_pool()
+assert model._pool is None
+
+# still usable, the pool of the call stopped after it
+assert_matrix_close(model._p_y_given_x_parallel(x), expected, "Scores after close")
+assert model._pool is None
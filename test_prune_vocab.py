@@ -0,0 +1,62 @@
+import copy
+import numpy as np
+
+from dcnn import DCNN
+from prune_vocab import (prune, prune_vocab)
+from sentiment import get_word_index_array
+
+from test_util import (assert_matrix_close, random_params)
+
+rng = np.random.RandomState(1234)
+
+vocab_size, embed_dm = 50, 8
+
+p = random_params(rng, vocab_size, embed_dm)
+
+word2index = dict((u"word%d" %(i), i) for i in xrange(vocab_size - 1))
+word2index[u"<PADDING>"] = vocab_size - 1
+
+keep_rows = [7, 3, 20, 11]
+new_word2index, new_embeddings, old_to_new = prune(p.embeddings, word2index, keep_rows)
+
+# padding, the kept rows and <UNK>
+assert new_embeddings.shape == (6, embed_dm)
+assert new_word2index[u"word3"] == 2
+assert new_word2index[u"<UNK>"] == 5
+
+# the pruned words dropped, mapped to <UNK> when looked up
+assert sorted(new_word2index) == sorted([u"<PADDING>", u"<UNK>"] + [u"word%d" %(i) for i in keep_rows])
+
+words = [u"word%d" %(i) for i in xrange(vocab_size - 1)]
+assert get_word_index_array(words, new_word2index, new_word2index[u"<UNK>"]) == old_to_new[:-1].tolist()
+
+pruned = [i for i in xrange(vocab_size) if i not in keep_rows + [vocab_size - 1]]
+assert_matrix_close(new_embeddings[5], p.embeddings[pruned].mean(axis = 0), "<UNK> embedding")
+
+########## same prediction on the kept words ##########
+
+x = np.asarray(rng.choice(keep_rows + [vocab_size - 1], size = (4, 9)), dtype = np.int32)
+
+pruned_p = copy.copy(p)
+pruned_p.embeddings = new_embeddings
+
+assert_matrix_close(DCNN(pruned_p)._p_y_given_x(old_to_new[x]),
+                    DCNN(p)._p_y_given_x(x),
+                    "Forward pass on the pruned vocabulary")
+
+########## tolerance ##########
+
+dev = (np.asarray(rng.randint(vocab_size - 1, size = (30, 9)), dtype = np.int32), rng.randint(2, size = 30))
+ranking = np.arange(vocab_size)
+
+new_word2index, new_embeddings, old_to_new = prune_vocab(p, word2index, ranking, 5, dev, tolerance = 0)
+pruned_p.embeddings = new_embeddings
+assert ((DCNN(pruned_p).predict(old_to_new[dev[0]]) != dev[1]).mean() <= 
+        (DCNN(p).predict(dev[0]) != dev[1]).mean())
+
+# never met
+try:
+    prune_vocab(p, word2index, ranking, 5, dev, tolerance = -1)
+    assert False, "a vocabulary beyond the tolerance should not be returned"
+except ValueError:
+    pass
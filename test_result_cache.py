@@ -0,0 +1,118 @@
+import numpy as np
+
+from dcnn import DCNN
+from sentiment import Predictor
+from result_cache import ResultCache
+
+from test_util import (assert_matrix_close, random_params)
+
+rng = np.random.RandomState(1234)
+
+vocab_size, embed_dm = 20, 8
+
+words = [u"w%d" %(i) for i in xrange(vocab_size - 1)]
+word2index = dict((word, i) for i, word in enumerate(words))
+word2index[u"<PADDING>"] = vocab_size - 1
+
+model = DCNN(random_params(rng, vocab_size, embed_dm))
+predictor = Predictor(model, word2index)
+
+sents = [u"w1 w2 w3",
+         u"w4",
+         u"w1  w2 w3",
+         u"w5 w6 w7 w8 w9 w1 w2",
+         u"w1 w2 w3",
+         u"unknown"]
+keys = [(1, 2, 3), (4, ), (1, 2, 3), (5, 6, 7, 8, 9, 1, 2), (1, 2, 3), ()]
+
+########## the scores of the sentences alone, whatever they are run with ##########
+
+alone = np.concatenate([model._p_y_given_x(np.asarray([key or (vocab_size - 1, )], dtype = np.int32))[:, 1]
+                        for key in keys])
+
+assert_matrix_close(predictor.scores_of_sents(sents, use_cache = False), alone, "Scores without cache")
+assert_matrix_close(predictor.scores_of_sents(sents[::-1], use_cache = False), alone[::-1],
+                    "Scores without cache, in another order")
+
+########## many lengths in few forward passes ##########
+
+passes = []
+def counting(forward, name):
+    def f(x):
+        passes.append((name, len(x)))
+        return forward(x)
+    return f
+model._p_y_given_x_parallel = counting(model._p_y_given_x_parallel, "matrix")
+model._p_y_given_x_packed_parallel = counting(model._p_y_given_x_packed_parallel, "packed")
+
+mixed = [u" ".join(words[:length]) for length in (1, 5, 2, 9, 3, 7, 2, 6, 4, 8, 2)]
+mixed_alone = np.concatenate([model._p_y_given_x(np.asarray([range(length)], dtype = np.int32))[:, 1]
+                              for length in (1, 5, 2, 9, 3, 7, 2, 6, 4, 8, 2)])
+
+assert_matrix_close(predictor.scores_of_sents(mixed, use_cache = False), mixed_alone, "Mixed lengths")
+assert passes == [("packed", 11)], passes
+
+# the lengths with a full batch are run apart, the others packed together
+del passes[:]
+assert_matrix_close(predictor.scores_of_sents(mixed, max_batch_size = 3, use_cache = False), mixed_alone, 
+                    "Mixed lengths, a full batch")
+assert passes == [("matrix", 3), ("packed", 3), ("packed", 3), ("packed", 2)], passes
+
+del model._p_y_given_x_parallel, model._p_y_given_x_packed_parallel
+
+# the word index sequences run by the model
+scored = []
+run = predictor._scores_of_word_indices
+def counting_run(word_indices, *args):
+    scored.extend(tuple(sent) for sent in word_indices)
+    return run(word_indices, *args)
+predictor._scores_of_word_indices = counting_run
+
+########## misses, each word index sequence run once ##########
+
+assert_matrix_close(predictor.scores_of_sents(sents), alone, "Scores with cache, all missing")
+assert scored == [(1, 2, 3), (4, ), (5, 6, 7, 8, 9, 1, 2), ()]
+
+stats = predictor.cache.stats()
+assert stats["texts"] == {"size": 5, "hits": 0, "misses": 6}, stats
+assert stats["words"] == {"size": 4, "hits": 0, "misses": 5}, stats
+
+########## text and word index hits ##########
+
+del scored[:]
+scores = predictor.scores_of_sents([u"w4", u"w1 w2   w3", u"w5 w6 w7 w8 w9 w1 w2"])
+assert scored == []
+assert_matrix_close(scores, alone[[1, 0, 3]], "Scores from the cache")
+
+stats = predictor.cache.stats()
+assert stats["texts"] == {"size": 6, "hits": 2, "misses": 7}, stats
+assert stats["words"] == {"size": 4, "hits": 1, "misses": 5}, stats
+
+# the same scores, whatever traffic came before
+for sent, score in zip(sents, alone):
+    assert_matrix_close(predictor.scores_of_sents([sent]), [score], "Cached score of %r" %(sent))
+
+########## dropped when the model changes ##########
+
+predictor.model = DCNN(random_params(rng, vocab_size, embed_dm))
+
+del scored[:]
+scores = predictor.scores_of_sents([u"w4"])
+assert scored == [(4, )]
+assert_matrix_close(scores, predictor.model._p_y_given_x(np.asarray([[4]], dtype = np.int32))[:, 1],
+                    "Score of the new model")
+assert predictor.cache.stats()["words"]["size"] == 1
+
+########## validation ##########
+
+cache = ResultCache(text_size = 2, words_size = 2)
+cache.validate("model a")
+cache.texts.put(u"a", 0.5)
+cache.words.put((1, ), 0.5)
+
+cache.validate("model a")
+assert cache.texts.get(u"a") == 0.5
+
+cache.validate("model b")
+assert cache.texts.get(u"a") is None and len(cache.words) == 0
+assert cache.source == "model b"
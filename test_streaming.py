@@ -0,0 +1,55 @@
+import numpy as np
+
+from dcnn import DCNN
+from sentiment import Predictor
+
+from test_util import (assert_matrix_close, random_params)
+
+rng = np.random.RandomState(1234)
+
+vocab_size, embed_dm = 20, 8
+
+p = random_params(rng, vocab_size, embed_dm)
+
+words = [u"w%d" %(i) for i in xrange(vocab_size - 1)]
+word2index = dict((word, i) for i, word in enumerate(words))
+word2index[u"<PADDING>"] = vocab_size - 1
+
+predictor = Predictor(DCNN(p), word2index)
+
+def random_texts(n, lengths):
+    return [u" ".join(rng.choice(words, size = rng.choice(lengths))) for i in xrange(n)]
+
+########## same scores in either order and as the whole list ##########
+
+texts = random_texts(50, [2, 8, 15, 30]) + [u"unknown words only"]
+expected = predictor.scores_of_sents(texts, use_cache = False)
+
+# the sentences alone
+assert_matrix_close(expected,
+                    [predictor.scores_of_sents([text], use_cache = False)[0] for text in texts],
+                    "Scores of the whole list")
+
+indices = {}
+for ordered in (True, False):
+    pairs = list(predictor.iter_scores(iter(texts), batch_size = 4, ordered = ordered))
+    indices[ordered] = [i for i, score in pairs]
+    assert sorted(indices[ordered]) == range(len(texts))
+
+    scores = np.empty(len(texts), dtype = expected.dtype)
+    for i, score in pairs:
+        scores[i] = score
+    assert_matrix_close(scores, expected, "Streamed scores(ordered=%s)" %(ordered))
+
+########## order ##########
+
+assert indices[True] == range(len(texts))
+assert indices[False] != indices[True]
+
+########## truncation ##########
+
+text = u"w1 w2 w3 w4 w5 w6"
+(i, truncated), = predictor.iter_scores([text], max_len = 3)
+assert_matrix_close(truncated, predictor.scores_of_sents([u"w1 w2 w3"], use_cache = False)[0], "Truncated text")
+
+assert list(predictor.iter_scores([])) == []
@@ -0,0 +1,191 @@
+import os, tempfile
+
+import thread_budget
+from thread_budget import (parse_cpu_max, parse_cpu_list, parse_proc_cgroup, cgroup_cpu_quota, available_cores, 
+                           split, processes_per_host, blas_threads_in_effect, BLAS_THREAD_VARS, ThreadBudget)
+
+def write_files(files):
+    """
+    a directory of the given files, by path relative to it
+    """
+    root = tempfile.mkdtemp()
+    for path, content in files.items():
+        path = os.path.join(root, path)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, "w") as f:
+            f.write(content)
+    return root
+
+########## cgroup v2 cpu.max ##########
+
+assert parse_cpu_max("200000 100000\n") == 2
+assert parse_cpu_max("50000 100000") == 0.5
+assert parse_cpu_max("max 100000") is None
+assert parse_cpu_max("max") is None
+assert parse_cpu_max("300000") == 3
+assert parse_cpu_max("") is None
+
+# the /proc/self/cgroup of a process in no cgroup
+NO_PROC_CGROUP = "/nonexistent/proc/self/cgroup"
+
+def quota(files, proc_cgroup = None):
+    """
+    the quota of a cgroup mount point of the given files, 
+    for a process whose /proc/self/cgroup has the content `proc_cgroup`
+    """
+    if proc_cgroup is None:
+        return cgroup_cpu_quota(write_files(files), NO_PROC_CGROUP)
+    return cgroup_cpu_quota(write_files(files), os.path.join(write_files({"cgroup": proc_cgroup}), "cgroup"))
+
+assert quota({"cpu.max": "250000 100000\n"}) == 2.5
+assert quota({"cpu.max": "max 100000\n"}) is None
+
+########## cgroup v1 ##########
+
+for controller in ("cpu", "cpu,cpuacct"):
+    assert quota({controller + "/cpu.cfs_quota_us": "150000\n",
+                  controller + "/cpu.cfs_period_us": "100000\n"}) == 1.5
+
+# unlimited
+assert quota({"cpu/cpu.cfs_quota_us": "-1\n",
+              "cpu/cpu.cfs_period_us": "100000\n"}) is None
+# the period missing
+assert quota({"cpu/cpu.cfs_quota_us": "150000\n"}) is None
+
+# v2 first
+assert quota({"cpu.max": "100000 100000",
+              "cpu/cpu.cfs_quota_us": "400000",
+              "cpu/cpu.cfs_period_us": "100000"}) == 1
+
+########## the cgroup of the process, by /proc/self/cgroup ##########
+
+assert parse_proc_cgroup("") == (None, None)
+assert parse_proc_cgroup("0::/\n") == ("/", None)
+assert parse_proc_cgroup("5:cpuset:/a\n2:cpuacct:/b\n1:cpu:/c\n") == (None, "/c")
+assert parse_proc_cgroup("4:cpu,cpuacct:/user.slice/session-1.scope\n1:name=systemd:/x\n0::/\n") == \
+    ("/", "/user.slice/session-1.scope")
+
+# a systemd slice on a host without a cgroup namespace, the root having no quota
+v2_slice = "0::/system.slice/web.service\n"
+assert quota({"system.slice/web.service/cpu.max": "200000 100000"}, v2_slice) == 2
+assert quota({"system.slice/web.service/cpu.max": "max 100000",
+              "system.slice/cpu.max": "300000 100000"}, v2_slice) == 3
+
+# the smallest quota of the cgroup and its ancestors
+assert quota({"system.slice/web.service/cpu.max": "400000 100000",
+              "system.slice/cpu.max": "300000 100000",
+              "cpu.max": "max 100000"}, v2_slice) == 3
+assert quota({"system.slice/web.service/cpu.max": "max 100000",
+              "system.slice/cpu.max": "max 100000"}, v2_slice) is None
+
+v1_slice = "3:cpu,cpuacct:/system.slice/web.service\n0::/\n"
+for controller in ("cpu", "cpu,cpuacct"):
+    assert quota({controller + "/system.slice/web.service/cpu.cfs_quota_us": "50000",
+                  controller + "/system.slice/web.service/cpu.cfs_period_us": "100000",
+                  controller + "/cpu.cfs_quota_us": "-1",
+                  controller + "/cpu.cfs_period_us": "100000"}, v1_slice) == 0.5
+
+# not under the mount point(e.g, a container without a cgroup namespace): the mount point's own
+assert quota({"cpu.max": "150000 100000"}, "0::/docker/0123abcd\n") == 1.5
+assert quota({"cpu/cpu.cfs_quota_us": "150000",
+              "cpu/cpu.cfs_period_us": "100000"}, "1:cpu:/docker/0123abcd\n") == 1.5
+
+# an odd /proc/self/cgroup
+assert quota({"cpu.max": "150000 100000"}, "not a cgroup line\n") == 1.5
+
+########## absent cgroup files ##########
+
+assert quota({}) is None
+assert quota({}, v2_slice) is None
+assert cgroup_cpu_quota("/nonexistent/cgroup", NO_PROC_CGROUP) is None
+
+########## Cpus_allowed_list ##########
+
+assert parse_cpu_list("0-3,8") == 5
+assert parse_cpu_list("0-3,8,10-11\n") == 7
+assert parse_cpu_list("5") == 1
+assert parse_cpu_list("0-1, 4") == 3
+assert parse_cpu_list("") == 0
+
+########## the cores: the allowed cpus, capped by the quota ##########
+
+online = os.sysconf("SC_NPROCESSORS_ONLN")
+
+status = write_files({"status": "Name:\tpython\nCpus_allowed:\t1\nCpus_allowed_list:\t0\n"})
+assert available_cores(os.path.join(status, "status"), write_files({}), NO_PROC_CGROUP) == 1
+
+# the quota rounded up
+status = write_files({"status": "Cpus_allowed_list:\t0-%d\n" %(online - 1)})
+assert available_cores(os.path.join(status, "status"), write_files({"cpu.max": "50000 100000"}), NO_PROC_CGROUP) == 1
+assert available_cores(os.path.join(status, "status"), write_files({"cpu.max": "max 100000"}), NO_PROC_CGROUP) == online
+
+# nothing to read
+assert available_cores("/nonexistent/status", "/nonexistent/cgroup", NO_PROC_CGROUP) == online
+status = write_files({"status": "Cpus_allowed_list:\t\n"})
+assert available_cores(os.path.join(status, "status"), write_files({}), NO_PROC_CGROUP) == online
+
+########## inference and training ##########
+
+assert split(4, "inference") == ThreadBudget(cores = 4, blas_threads = 1, workers = 4)
+assert split(4, "training") == ThreadBudget(cores = 4, blas_threads = 4, workers = 1)
+assert split(1, "inference") == split(1, "training") == ThreadBudget(1, 1, 1)
+
+########## processes sharing the host ##########
+
+assert split(8, "inference", processes = 4) == ThreadBudget(cores = 2, blas_threads = 1, workers = 2)
+assert split(8, "training", processes = 3) == ThreadBudget(cores = 2, blas_threads = 2, workers = 1)
+assert split(2, "inference", processes = 4) == ThreadBudget(cores = 1, blas_threads = 1, workers = 1)
+
+assert processes_per_host({}) == 1
+assert processes_per_host({"WEB_CONCURRENCY": "3"}) == 3
+assert processes_per_host({"SENTIMENT_PROCESSES": "2", "WEB_CONCURRENCY": "3"}) == 2
+assert processes_per_host({"SENTIMENT_PROCESSES": "", "WEB_CONCURRENCY": " 5\n"}) == 5
+assert processes_per_host({"WEB_CONCURRENCY": "0"}) == 1
+assert processes_per_host({"WEB_CONCURRENCY": "many"}) == 1
+
+########## the BLAS thread variables already set ##########
+
+assert blas_threads_in_effect({}) is None
+assert blas_threads_in_effect({"OMP_NUM_THREADS": "3"}) == 3
+assert blas_threads_in_effect({"OMP_NUM_THREADS": "3", "OPENBLAS_NUM_THREADS": "1"}) == 1
+assert blas_threads_in_effect({"MKL_NUM_THREADS": "x", "VECLIB_MAXIMUM_THREADS": "2"}) == 2
+
+def apply_with(environ, role):
+    """
+    `thread_budget.apply` in the given environment, from scratch
+    """
+    saved = dict(os.environ)
+    for name in BLAS_THREAD_VARS + thread_budget.PROCESSES_VARS:
+        os.environ.pop(name, None)
+    os.environ.update(environ)
+    thread_budget.BUDGET = None
+    try:
+        return thread_budget.apply(role), dict((name, os.environ[name]) for name in BLAS_THREAD_VARS)
+    finally:
+        os.environ.clear()
+        os.environ.update(saved)
+        thread_budget.BUDGET = None
+
+cores = available_cores()
+
+budget, environ = apply_with({}, "inference")
+assert budget == split(cores, "inference") and set(environ.values()) == {"1"}, (budget, environ)
+
+# the preset count, and as many workers as it leaves room for
+budget, environ = apply_with({"OPENBLAS_NUM_THREADS": "2"}, "inference")
+assert budget == ThreadBudget(cores, blas_threads = 2, workers = max(1, cores // 2)), budget
+assert environ["OPENBLAS_NUM_THREADS"] == "2" and environ["MKL_NUM_THREADS"] == "1"
+assert "2 BLAS threads" in thread_budget.describe(budget)
+
+budget, environ = apply_with({"OMP_NUM_THREADS": "1"}, "training")
+assert budget == ThreadBudget(cores, blas_threads = cores, workers = 1), budget
+
+budget, environ = apply_with({"WEB_CONCURRENCY": str(cores * 2)}, "inference")
+assert budget == ThreadBudget(1, blas_threads = 1, workers = 1), budget
+
+try:
+    split(4, "serving")
+    assert False, "unknown role"
+except ValueError:
+    pass
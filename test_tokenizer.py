@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+import os, re, sys, glob, random
+from ast import literal_eval
+
+import nltk
+
+import ptb
+from ptb import (parse, flatten_tree)
+from prune_vocab import read_traffic
+from tokenizer import (NLTK_VERSION, word_tokenize, word_tokenize_sents)
+
+if nltk.__version__ != NLTK_VERSION:
+    print "nltk %s installed, the tokenizer reproduces nltk %s: skipped" %(nltk.__version__, NLTK_VERSION)
+    sys.exit(0)
+
+texts = [u"simultaneously heart breaking and very funny , the last kiss is really all about performances .",
+         u"( u ) stupid .",
+         u'Just saw it with Dr. Smith... "amazing"!! I can\'t wait for part 2. #movies @someone http://t.co/abc',
+         u"lol that's gonna be the worst game EVER. smh :(",
+         u"RT @bob: U.S. stocks fell 3.5% at 10 a.m. today -- ugh. Wanna bet?",
+         u"'tis the season...Gimme a break!!!\n\nJ. K. Rowling's new book (finally) is out.",
+         u"caf\xe9 “best” coffee in town, 5 stars. ’nuff said",
+         u"",
+         u"   "]
+
+# the sentences of the trees in the ptb.py doctests and of the Stanford treebank, if there
+trees = [literal_eval(literal) for literal in re.findall(r"parse\(('.*?')\)\n", ptb.flatten_tree.__doc__)]
+for path in glob.glob("data/stanfordSentimentTreebank/trees/*.txt"):
+    trees += open(path).read().decode("utf8").splitlines()
+texts += [u" ".join(flatten_tree(parse(tree))[0]) for tree in trees if tree.strip()]
+
+# the collected tweets, if there
+if os.path.exists("data_collected.csv"):
+    texts += read_traffic("data_collected.csv")
+
+# random tweet-like texts
+pieces = [u"Good", u"movie", u".", u"...", u"..", u"!", u"?", u"Dr.", u"Mr.", u"U.S.", u"J.", u"a.m.", u"3.5", u"10.",
+          u'"', u"'", u"''", u"``", u"(", u")", u"[", u"--", u",", u":", u";", u"@bob", u"#fail", u"http://t.co/x",
+          u"can't", u"I'm", u"cannot", u"gonna", u"wanna", u"'tis", u"kids'", u"The", u"the", u"lol", u":)",
+          u"&amp;", u"$5", u"100%", u"caf\xe9", u"“hi”", u"Co.", u"e.g.", u"etc.", u"vs.", u"No.", u"\n", u"x.", u"A."]
+rng = random.Random(1234)
+for i in xrange(3000):
+    texts.append(u"".join(rng.choice(pieces) + rng.choice([u" ", u" ", u"", u"  ", u"\t"])
+                          for j in xrange(rng.randint(1, 14))))
+
+for text in texts:
+    assert word_tokenize(text) == nltk.word_tokenize(text), "%r: %r != %r" %(
+        text, word_tokenize(text), nltk.word_tokenize(text))
+
+assert word_tokenize_sents(texts) == [word_tokenize(text) for text in texts]
@@ -23,3 +23,29 @@ def assert_about_eq(actual, expected, name):
         print actual
         print "Expected:"
         print expected
+
+def assert_matrix_close(actual, expected, name, atol = 1e-5):
+    """
+    `assert_matrix_eq` that fails: raises AssertionError with the mismatches
+    """
+    np.testing.assert_allclose(actual, expected, rtol = 0, atol = atol, err_msg = name)
+    print "%s: OK" %(name)
+
+class Params(object):
+    pass
+
+def random_params(rng, vocab_size = 50, embed_dm = 8, ks = (5, 3), nkerns = (3, 2)):
+    """
+    the parameters of the small DCNN of the tests, drawn from `rng`: 
+    two layers of height-1 filters of widths 4 and 3, the first one folded
+    """
+    p = Params()
+    p.embeddings = rng.rand(vocab_size, embed_dm)
+    p.conv_layer_n = 2
+    p.ks = list(ks)
+    p.fold = [1, 0]
+    p.W = [rng.rand(nkerns[0], 1, 1, 4) - 0.5, rng.rand(nkerns[1], nkerns[0], 1, 3) - 0.5]
+    p.b = [rng.rand(nkerns[0]), rng.rand(nkerns[1])]
+    p.logreg_W = rng.rand(nkerns[1] * ks[1] * embed_dm / 2, 2)
+    p.logreg_b = rng.rand(2)
+    return p
@@ -0,0 +1,46 @@
+import os, shutil, tempfile
+from cPickle import (dump, load)
+
+from param_util import (load_word2index, word2index_path)
+
+dirname = tempfile.mkdtemp()
+corpus_path = os.path.join(dirname, "twitter.pkl")
+path = word2index_path(corpus_path)
+
+word2index = dict((u"w%d" %(i), i) for i in xrange(100))
+dump((None, None, None, word2index), open(corpus_path, "wb"), protocol = 2)
+
+########## written from the corpus the first time, read from the file afterwards ##########
+
+assert load_word2index(corpus_path) == word2index
+assert load(open(path, "rb")) == word2index
+assert sorted(os.listdir(dirname)) == ["twitter.pkl", "twitter.word2index.pkl"], "temporary file left"
+
+dump((None, None, None, {u"other": 0}), open(corpus_path, "wb"), protocol = 2)
+assert load_word2index(corpus_path) == word2index
+
+dump((None, None, None, word2index), open(corpus_path, "wb"), protocol = 2)
+
+########## a truncated or corrupted file is read from the corpus and written again ##########
+
+content = open(path, "rb").read()
+for broken in (content[:len(content) // 2], "", "not a pickle"):
+    with open(path, "wb") as f:
+        f.write(broken)
+
+    assert load_word2index(corpus_path) == word2index, repr(broken[:20])
+    assert load(open(path, "rb")) == word2index
+    assert sorted(os.listdir(dirname)) == ["twitter.pkl", "twitter.word2index.pkl"]
+
+########## a read-only directory: read from the corpus each time ##########
+
+if os.getuid() != 0:
+    os.remove(path)
+    os.chmod(dirname, 0555)
+    try:
+        assert load_word2index(corpus_path) == word2index
+        assert not os.path.exists(path)
+    finally:
+        os.chmod(dirname, 0755)
+
+shutil.rmtree(dirname)
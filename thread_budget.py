@@ -0,0 +1,273 @@
+"""
+The thread budget of the process: how many cores it may use and how they are split
+between the BLAS threads numpy(and theano) run the matrix products with
+and the worker threads of our own pools(see `dcnn.DCNN._p_y_given_x_parallel`)
+
+The BLAS libraries read their thread counts once, when loaded,
+so `apply` is to be called before numpy is imported:
+
+    import thread_budget
+    BUDGET = thread_budget.apply("inference")
+    import numpy as np
+"""
+import os, sys, math
+from collections import namedtuple
+
+BLAS_THREAD_VARS = ("OMP_NUM_THREADS",
+                    "OPENBLAS_NUM_THREADS",
+                    "MKL_NUM_THREADS",
+                    "VECLIB_MAXIMUM_THREADS")
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+
+# the number of serving processes on the host, which share its cores, 
+# by the first of these variables that is set(`WEB_CONCURRENCY` being the one of Heroku and gunicorn)
+PROCESSES_VARS = ("SENTIMENT_PROCESSES",
+                  "WEB_CONCURRENCY")
+
+ThreadBudget = namedtuple("ThreadBudget", ["cores", "blas_threads", "workers"])
+
+def parse_cpu_max(content):
+    """
+    the CPU quota, in cores, of the content of cgroup v2 `cpu.max`, None if unlimited
+
+    >>> parse_cpu_max("150000 100000")
+    1.5
+    >>> parse_cpu_max("max 100000") is None
+    True
+    """
+    fields = content.split()
+    if not fields or fields[0] == "max":
+        return None
+
+    # the period defaults to 100000 microseconds
+    quota, period = fields[0], (fields[1] if len(fields) > 1 else "100000")
+    return float(quota) / float(period)
+
+def parse_cpu_list(content):
+    """
+    the number of cpus in a cpu list, as `Cpus_allowed_list` of /proc/self/status
+
+    >>> parse_cpu_list("0-3,8,10-11")
+    7
+    """
+    n = 0
+    for part in content.strip().split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-")
+            n += int(end) - int(start) + 1
+        else:
+            n += 1
+    return n
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except IOError:
+        return None
+
+def parse_proc_cgroup(content):
+    """
+    the cgroup path of the process in the v2 hierarchy and in the v1 `cpu` controller, 
+    None for those it is not in, of the content of /proc/self/cgroup
+
+    >>> parse_proc_cgroup("4:cpu,cpuacct:/user.slice\\n3:cpuset:/\\n0::/system.slice/web.service\\n")
+    ('/system.slice/web.service', '/user.slice')
+    """
+    v2_path = v1_path = None
+    for line in content.splitlines():
+        fields = line.split(":", 2)
+        if len(fields) != 3:
+            continue
+
+        hierarchy, controllers, path = fields
+        if hierarchy == "0" and not controllers:
+            v2_path = path
+        elif "cpu" in controllers.split(","):
+            v1_path = path
+    return v2_path, v1_path
+
+def _cgroup_dirs(mount, path):
+    """
+    the directories of the cgroup under the mount point, from its own up to the mount point
+
+    >>> _cgroup_dirs("/sys/fs/cgroup", "/system.slice/web.service")
+    ['/sys/fs/cgroup/system.slice/web.service', '/sys/fs/cgroup/system.slice', '/sys/fs/cgroup']
+    """
+    parts = [part for part in (path or "").split("/") if part]
+    return [os.path.join(mount, *parts[:n]) for n in xrange(len(parts), -1, -1)]
+
+def _smallest(quotas):
+    quotas = [quota for quota in quotas if quota is not None]
+    return min(quotas) if quotas else None
+
+def cgroup_cpu_quota(root = CGROUP_ROOT, proc_cgroup_path = "/proc/self/cgroup"):
+    """
+    the CPU quota of the cgroup of the process, in cores(possibly fractional), None if unlimited or unknown.
+
+    Both cgroup v2(`cpu.max`) and v1(`cpu.cfs_quota_us` over `cpu.cfs_period_us`) are looked at, 
+    in the cgroup of the process(by /proc/self/cgroup, e.g, its systemd slice) and its ancestors, 
+    the smallest quota being the one in effect. 
+    In a cgroup namespace, or if the cgroup is not under the mount point, that is the mount point alone
+    """
+    v2_path, v1_path = parse_proc_cgroup(_read(proc_cgroup_path) or "")
+
+    contents = [_read(os.path.join(directory, "cpu.max"))
+                for directory in _cgroup_dirs(root, v2_path)]
+    if any(contents):
+        return _smallest(parse_cpu_max(content) for content in contents if content)
+
+    for controller in ("cpu", "cpu,cpuacct"):
+        quotas = []
+        for directory in _cgroup_dirs(os.path.join(root, controller), v1_path):
+            quota = _read(os.path.join(directory, "cpu.cfs_quota_us"))
+            period = _read(os.path.join(directory, "cpu.cfs_period_us"))
+            if quota and period:
+                # -1 if unlimited
+                quotas.append(float(quota) / float(period) if int(quota) > 0 else None)
+        if quotas:
+            return _smallest(quotas)
+
+    return None
+
+def available_cores(status_path = "/proc/self/status", cgroup_root = CGROUP_ROOT, 
+                    proc_cgroup_path = "/proc/self/cgroup"):
+    """
+    the number of cores the process may use:
+    the cores it is allowed to run on, capped by the cgroup quota(rounded up)
+    """
+    try:
+        # as `multiprocessing.cpu_count`, whose import would take longer than the rest of this module
+        cores = os.sysconf("SC_NPROCESSORS_ONLN")
+    except (AttributeError, ValueError):
+        import multiprocessing
+        cores = multiprocessing.cpu_count()
+
+    for line in (_read(status_path) or "").splitlines():
+        if line.startswith("Cpus_allowed_list:"):
+            allowed = parse_cpu_list(line.split(":", 1)[1])
+            if allowed > 0:
+                cores = min(cores, allowed)
+
+    quota = cgroup_cpu_quota(cgroup_root, proc_cgroup_path)
+    if quota is not None:
+        cores = min(cores, max(1, int(math.ceil(quota))))
+
+    return cores
+
+def processes_per_host(environ = os.environ):
+    """
+    the number of processes sharing the cores, by `PROCESSES_VARS`, 1 if none is set
+
+    >>> processes_per_host({"WEB_CONCURRENCY": "4"}), processes_per_host({})
+    (4, 1)
+    """
+    for name in PROCESSES_VARS:
+        value = environ.get(name, "").strip()
+        if value:
+            try:
+                return max(1, int(value))
+            except ValueError:
+                print >> sys.stderr, "thread_budget: %s=%r is not a number, ignored" %(name, value)
+    return 1
+
+def split(cores, role, processes = 1):
+    """
+    Split the cores of each of the `processes` processes of the host between BLAS and worker threads:
+
+    - inference: one worker per core, each running single-threaded BLAS,
+      as the products of a sentence batch are too small to be worth splitting further
+    - training: the theano graph runs in one thread, with all the cores given to BLAS
+
+    >>> split(8, "inference")
+    ThreadBudget(cores=8, blas_threads=1, workers=8)
+    >>> split(8, "training")
+    ThreadBudget(cores=8, blas_threads=8, workers=1)
+    >>> split(8, "inference", processes = 3)
+    ThreadBudget(cores=2, blas_threads=1, workers=2)
+    """
+    # at least one core each, if there are more processes than cores
+    cores = max(1, cores // processes)
+
+    if role == "inference":
+        return ThreadBudget(cores, blas_threads = 1, workers = cores)
+    elif role == "training":
+        return ThreadBudget(cores, blas_threads = cores, workers = 1)
+    else:
+        raise ValueError("unknown role %r" %(role))
+
+def blas_threads_in_effect(environ = os.environ):
+    """
+    the BLAS thread count the environment sets, None if it sets none: 
+    each BLAS library reads its own variable before `OMP_NUM_THREADS`, 
+    and as it is not known which one numpy was built with, the largest is taken
+
+    >>> blas_threads_in_effect({"OMP_NUM_THREADS": "4", "OPENBLAS_NUM_THREADS": "1", "MKL_NUM_THREADS": "2"})
+    2
+    >>> blas_threads_in_effect({"OMP_NUM_THREADS": "4"})
+    4
+    """
+    counts = {}
+    for name in BLAS_THREAD_VARS:
+        try:
+            counts[name] = int(environ[name])
+        except (KeyError, ValueError):
+            pass
+
+    library_counts = [n for name, n in counts.items() if name != "OMP_NUM_THREADS"]
+    if library_counts:
+        return max(library_counts)
+    return counts.get("OMP_NUM_THREADS")
+
+BUDGET = None
+
+def apply(role):
+    """
+    Decide the thread budget of the process and set the BLAS thread variables accordingly,
+    those already set in the environment being kept: 
+    the budget then has the BLAS thread count they set, 
+    and for inference as many workers as the cores leave room for
+
+    Only the first call decides, the later ones(e.g, by modules imported afterwards) return the same budget
+
+    Returns:
+    the ThreadBudget, also kept as `thread_budget.BUDGET`
+    """
+    global BUDGET
+    if BUDGET is not None:
+        return BUDGET
+
+    if "numpy" in sys.modules:
+        print >> sys.stderr, "thread_budget: numpy already imported, the BLAS thread count may not be applied"
+
+    BUDGET = split(available_cores(), role, processes_per_host())
+
+    for name in BLAS_THREAD_VARS:
+        os.environ.setdefault(name, str(BUDGET.blas_threads))
+
+    blas_threads = blas_threads_in_effect()
+    if blas_threads is not None and blas_threads != BUDGET.blas_threads:
+        workers = BUDGET.workers
+        if role == "inference":
+            workers = max(1, BUDGET.cores // max(blas_threads, 1))
+        BUDGET = BUDGET._replace(blas_threads = blas_threads, workers = workers)
+
+    return BUDGET
+
+def describe(budget = None):
+    """
+    one line of the budget, for logging
+    """
+    budget = budget or BUDGET
+    return "thread budget: %d cores, %d BLAS threads, %d workers(%s)" %(
+        budget.cores, budget.blas_threads, budget.workers,
+        ", ".join("%s=%s" %(name, os.environ.get(name)) for name in BLAS_THREAD_VARS)
+    )
+
+if __name__ == "__main__":
+    for role in ("inference", "training"):
+        print role, describe(split(available_cores(), role, processes_per_host()))
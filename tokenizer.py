@@ -0,0 +1,346 @@
+"""
+`nltk.word_tokenize` without nltk
+
+`nltk.word_tokenize`(of the nltk in requirements.txt) splits the text into sentences by the Punkt model,
+then each sentence by the Treebank rules. Here:
+
+- the Punkt model shipped in nltk_data is read without the nltk classes,
+  and only the candidate sentence ends(".", "?" and "!" followed by a token) are examined,
+  by the rules of `nltk.tokenize.punkt.PunktSentenceTokenizer` on plain strings
+- the Treebank rules of `nltk.tokenize.treebank.TreebankWordTokenizer` are compiled once
+
+Usage: python tokenizer.py [--traffic_path data_collected.csv] [--repeat 5]
+"""
+import os, re, sys
+from cPickle import Unpickler
+
+# the version whose output is reproduced
+NLTK_VERSION = "3.0.1"
+
+PUNKT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          "nltk_data", "tokenizers", "punkt", "english.pickle")
+
+######################################################################
+# Punkt sentence boundaries
+######################################################################
+
+_NON_WORD = ur"(?:[?!)\";}\]\*:@\'\({\[])"
+_MULTI_CHAR = ur"(?:\-{2,}|\.{2,}|(?:\.\s){2,}\.)"
+_WORD_START = ur"[^\(\"\`{\[:;&\#\*@\)}\]\-,]"
+
+PUNKT_WORD_RE = re.compile(
+    ur"(%(MultiChar)s|(?=%(WordStart)s)\S+?(?=\s|$|%(NonWord)s|%(MultiChar)s|,(?=$|\s|%(NonWord)s|%(MultiChar)s))|\S)" %{
+        "NonWord": _NON_WORD, "MultiChar": _MULTI_CHAR, "WordStart": _WORD_START
+    }, re.UNICODE)
+
+PERIOD_CONTEXT_RE = re.compile(
+    ur"\S*[\.\?!](?=(?P<after_tok>%s|\s+(?P<next_tok>\S+)))" %(_NON_WORD), re.UNICODE)
+
+BOUNDARY_REALIGNMENT_RE = re.compile(ur'["\')\]}]+?(?:\s+|(?=--)|$)', re.MULTILINE)
+
+_RE_ELLIPSIS = re.compile(ur"\.\.+$")
+_RE_NUMERIC = re.compile(ur"^-?[\.,]?\d[\d,\.-]*\.?$")
+_RE_INITIAL = re.compile(ur"[^\W\d]\.$", re.UNICODE)
+
+_ORTHO_BEG_UC, _ORTHO_MID_UC, _ORTHO_UNK_UC = 1 << 1, 1 << 2, 1 << 3
+_ORTHO_BEG_LC, _ORTHO_MID_LC, _ORTHO_UNK_LC = 1 << 4, 1 << 5, 1 << 6
+_ORTHO_UC = _ORTHO_BEG_UC + _ORTHO_MID_UC + _ORTHO_UNK_UC
+_ORTHO_LC = _ORTHO_BEG_LC + _ORTHO_MID_LC + _ORTHO_UNK_LC
+
+_SENT_END_CHARS = (u".", u"?", u"!")
+_PUNCTUATION = tuple(u";:,.!?")
+
+class _Attributes(object):
+    """
+    Any nltk object of the pickle, its attributes restored
+    """
+    def __setstate__(self, state):
+        if isinstance(state, dict):
+            self.__dict__.update(state)
+
+def _find_global(module, name):
+    if module.startswith("nltk."):
+        return _Attributes
+    __import__(module)
+    return getattr(sys.modules[module], name)
+
+class PunktParameters(object):
+    """
+    The abbreviations, collocations, sentence starters and orthographic contexts of a Punkt model
+    """
+    def __init__(self, path = PUNKT_PATH):
+        unpickler = Unpickler(open(path, "rb"))
+        unpickler.find_global = _find_global
+        params = unpickler.load()._params
+
+        self.abbrev_types = params.abbrev_types
+        self.collocations = params.collocations
+        self.sent_starters = params.sent_starters
+        self.ortho_context = dict(params.ortho_context)
+
+def _type(tok):
+    if _RE_NUMERIC.match(tok.lower()):
+        return u"##number##"
+    return tok.lower()
+
+def _without_period(typ):
+    if len(typ) > 1 and typ[-1] == u".":
+        return typ[:-1]
+    return typ
+
+def _first_pass(tok, params):
+    """
+    (sentence break, abbreviation, ellipsis) of a token by its type alone
+    """
+    if tok in _SENT_END_CHARS:
+        return True, False, False
+    if _RE_ELLIPSIS.match(tok):
+        return False, False, True
+    if tok.endswith(u".") and not tok.endswith(u".."):
+        lowered = tok[:-1].lower()
+        if lowered in params.abbrev_types or lowered.split(u"-")[-1] in params.abbrev_types:
+            return False, True, False
+        return True, False, False
+    return False, False, False
+
+def _ortho_heuristic(tok, typ, params):
+    """
+    whether the token starts a sentence: True, False or "unknown"
+    """
+    if tok in _PUNCTUATION:
+        return False
+
+    ortho_context = params.ortho_context.get(typ, 0)
+    if tok[0].isupper() and (ortho_context & _ORTHO_LC) and not (ortho_context & _ORTHO_MID_UC):
+        return True
+    if tok[0].islower() and ((ortho_context & _ORTHO_UC) or not (ortho_context & _ORTHO_BEG_LC)):
+        return False
+    return "unknown"
+
+def _is_sentence_break(tok, annotation, next_tok, next_annotation, params):
+    """
+    the sentence break decision on `tok` once its next token is seen
+    """
+    sentbreak, abbr, ellipsis = annotation
+    if not tok.endswith(u"."):
+        return sentbreak
+
+    typ = _without_period(_type(tok))
+    next_typ = _type(next_tok)
+    if next_annotation[0]:
+        next_typ = _without_period(next_typ)
+    is_initial = _RE_INITIAL.match(tok)
+
+    if (typ, next_typ) in params.collocations:
+        return False
+
+    if (abbr or ellipsis) and not is_initial:
+        if _ortho_heuristic(next_tok, next_typ, params) == True:
+            return True
+        if next_tok[0].isupper() and next_typ in params.sent_starters:
+            return True
+
+    if is_initial or typ == u"##number##":
+        is_sent_starter = _ortho_heuristic(next_tok, next_typ, params)
+        if is_sent_starter == False:
+            return False
+        if (is_sent_starter == "unknown" and is_initial and next_tok[0].isupper()
+            and not (params.ortho_context.get(next_typ, 0) & _ORTHO_LC)):
+            return False
+
+    return sentbreak
+
+def _contains_sentence_break(context, params):
+    """
+    whether any but the last token of the context ends a sentence
+    """
+    toks = [tok for line in context.split(u"\n") if line.strip()
+            for tok in PUNKT_WORD_RE.findall(line)]
+    annotations = [_first_pass(tok, params) for tok in toks]
+
+    return any(_is_sentence_break(toks[i], annotations[i], toks[i + 1], annotations[i + 1], params)
+               for i in xrange(len(toks) - 1))
+
+def sentence_spans(text, params):
+    """
+    the (start, end) of the sentences, as `PunktSentenceTokenizer.span_tokenize`
+    """
+    if not (u"." in text or u"?" in text or u"!" in text):
+        return [(0, len(text))] if text else []
+
+    slices = []
+    last_break = 0
+    for match in PERIOD_CONTEXT_RE.finditer(text):
+        if _contains_sentence_break(match.group() + match.group("after_tok"), params):
+            slices.append((last_break, match.end()))
+            last_break = (match.start("next_tok") if match.group("next_tok") else match.end())
+    slices.append((last_break, len(text)))
+
+    # the closing quotes and brackets after a sentence end go with it
+    spans = []
+    realign = 0
+    for i, (start, end) in enumerate(slices):
+        start += realign
+        if i + 1 == len(slices):
+            if text[start: end]:
+                spans.append((start, end))
+            break
+
+        next_start, next_end = slices[i + 1]
+        m = BOUNDARY_REALIGNMENT_RE.match(text[next_start: next_end])
+        if m:
+            spans.append((start, next_start + len(m.group(0).rstrip())))
+            realign = m.end()
+        else:
+            realign = 0
+            if text[start: end]:
+                spans.append((start, end))
+    return spans
+
+######################################################################
+# Treebank rules, without re.UNICODE as in nltk
+######################################################################
+
+# (pattern, replacement, the strings one of which the text must contain for the pattern to match),
+# the strings being checked first, as most tweets have none of them
+TREEBANK_RULES = [(re.compile(pattern), replacement, guard) for pattern, replacement, guard in [
+    # starting quotes
+    (r'^\"', r'``', ('"',)),
+    (r'(``)', r' \1 ', ('``',)),
+    (r'([ (\[{<])"', r'\1 `` ', ('"',)),
+
+    # punctuation
+    (r'([:,])([^\d])', r' \1 \2', (':', ',')),
+    (r'\.\.\.', r' ... ', ('...',)),
+    (r'[;@#$%&]', r' \g<0> ', tuple(';@#$%&')),
+    (r'([^\.])(\.)([\]\)}>"\']*)\s*$', r'\1 \2\3 ', ('.',)),
+    (r'[?!]', r' \g<0> ', ('?', '!')),
+    (r"([^'])' ", r"\1 ' ", ("' ",)),
+
+    # parens, brackets, etc.
+    (r'[\]\[\(\)\{\}\<\>]', r' \g<0> ', tuple('[](){}<>')),
+    (r'--', r' -- ', ('--',)),
+]]
+
+TREEBANK_ENDING_RULES = [(re.compile(pattern), replacement, guard) for pattern, replacement, guard in [
+    # ending quotes
+    (r'"', " '' ", ('"',)),
+    (r'(\S)(\'\')', r'\1 \2 ', ("''",)),
+    (r"([^' ])('[sS]|'[mM]|'[dD]|') ", r"\1 \2 ", ("'",)),
+    (r"([^' ])('ll|'LL|'re|'RE|'ve|'VE|n't|N'T) ", r"\1 \2 ", ("'",)),
+]]
+
+# the contractions, only split from each other by the rules before
+CONTRACTION_RULES = [re.compile(pattern) for pattern in [
+    r"(?i)\b(can)(not)\b",
+    r"(?i)\b(d)('ye)\b",
+    r"(?i)\b(gim)(me)\b",
+    r"(?i)\b(gon)(na)\b",
+    r"(?i)\b(got)(ta)\b",
+    r"(?i)\b(lem)(me)\b",
+    r"(?i)\b(mor)('n)\b",
+    r"(?i)\b(wan)(na) ",
+    r"(?i) ('t)(is)\b",
+    r"(?i) ('t)(was)\b",
+]]
+
+CONTRACTION_GUARD_RE = re.compile(r"(?i)cannot|d'ye|gimme|gonna|gotta|lemme|mor'n|wanna|'tis|'twas")
+
+def treebank_tokenize(sent):
+    """
+    the words of one sentence, as `TreebankWordTokenizer.tokenize`
+
+    >>> treebank_tokenize(u"They'll save and invest more.")
+    [u'They', u"'ll", u'save', u'and', u'invest', u'more', u'.']
+    """
+    for regexp, replacement, guard in TREEBANK_RULES:
+        if any(s in sent for s in guard):
+            sent = regexp.sub(replacement, sent)
+
+    # the extra spaces make things easier
+    sent = u" " + sent + u" "
+
+    for regexp, replacement, guard in TREEBANK_ENDING_RULES:
+        if any(s in sent for s in guard):
+            sent = regexp.sub(replacement, sent)
+
+    if CONTRACTION_GUARD_RE.search(sent):
+        for regexp in CONTRACTION_RULES:
+            sent = regexp.sub(r' \1 \2 ', sent)
+
+    return sent.split()
+
+######################################################################
+
+_PARAMS = []
+
+def punkt_params():
+    """
+    the Punkt parameters, read at the first call
+    """
+    if not _PARAMS:
+        _PARAMS.append(PunktParameters())
+    return _PARAMS[0]
+
+def word_tokenize(text):
+    """
+    the words of the text, as `nltk.word_tokenize`
+
+    >>> word_tokenize(u'Good movie. bad acting... "really" I can\\'t believe it!!')
+    [u'Good', u'movie', u'.', u'bad', u'acting', u'...', u'``', u'really', u"''", u'I', u'ca', u"n't", u'believe', u'it', u'!', u'!']
+    """
+    params = punkt_params()
+    return [tok for start, end in sentence_spans(text, params)
+            for tok in treebank_tokenize(text[start: end])]
+
+def word_tokenize_sents(texts):
+    """
+    the words of each text, the Punkt parameters and the compiled rules shared by the batch
+    """
+    params = punkt_params()
+    return [[tok for start, end in sentence_spans(text, params)
+             for tok in treebank_tokenize(text[start: end])]
+            for text in texts]
+
+if __name__ == "__main__":
+    import argparse, time
+    from prune_vocab import read_traffic
+
+    parser = argparse.ArgumentParser(description = "Throughput of the tokenizer against nltk.word_tokenize")
+    parser.add_argument("--traffic_path", type=str, default = None,
+                        help = "Path of the collected tweet csv, sample sentences if not given"
+    )
+    parser.add_argument("--repeat", type=int, default = 5,
+                        help = "Passes over the texts"
+    )
+    args = parser.parse_args(sys.argv[1:])
+
+    if args.traffic_path:
+        texts = read_traffic(args.traffic_path)
+    else:
+        texts = [u"simultaneously heart breaking and very funny , the last kiss is really all about performances .",
+                 u"( u ) stupid .",
+                 u'Just saw it with Dr. Smith... "amazing"!! I can\'t wait for part 2. #movies @someone http://t.co/abc',
+                 u"lol that's gonna be the worst game EVER. smh :("] * 250
+
+    start = time.time()
+    import nltk
+    nltk_import_time = time.time() - start
+
+    start = time.time()
+    punkt_params()
+    load_time = time.time() - start
+
+    for name, tokenize in (("nltk.word_tokenize", nltk.word_tokenize),
+                           ("tokenizer.word_tokenize", word_tokenize)):
+        start = time.time()
+        for i in xrange(args.repeat):
+            for text in texts:
+                tokenize(text)
+        elapsed = time.time() - start
+        print "%s: %.0f texts/s, %.1f us/text" %(name, len(texts) * args.repeat / elapsed,
+                                                elapsed / (len(texts) * args.repeat) * 1e6)
+
+    mismatches = sum(nltk.word_tokenize(text) != word_tokenize(text) for text in texts)
+    print "nltk import %.0f ms, Punkt model load %.0f ms, %d/%d texts tokenized differently(nltk %s)" %(
+        nltk_import_time * 1000, load_time * 1000, mismatches, len(texts), nltk.__version__)
@@ -1,12 +1,17 @@
 import os
+import thread_budget
+thread_budget.apply("inference")
+
 import tornado.ioloop
 import tornado.web
 import tornado.template
 import tornado.httpserver
 import tweepy
 import numpy as np
+from collections import OrderedDict
 
-from sentiment import (sentiment_scores_of_sents, sentiment_score)
+from sentiment import (sentiment_scores_of_sents, sentiment_score, TypingSession, explain, warm_up, 
+                       REGISTRY)
 
 html = """
 <!DOCTYPE html>
@@ -26,8 +31,13 @@ html = """
           var text_remaining = text_max - text_length;
 
           $('#tweet_count').html(text_remaining + ' characters left');
+
+          $.get('/live', {session: session_id, tweet: $('#tweet').val()}, function(score) {
+            $('#tweet_live').html(score ? 'Live sentiment index: ' + score : '');
+          });
         });
       });
+      var session_id = Math.random().toString(36).substring(2);
     </script>
     <script>
       $(document).ready(function() {
@@ -57,6 +67,7 @@ html = """
           <textarea name="tweet" id="tweet" rows="4" cols="50" placeholder="Input a tweet" maxlength="140"></textarea>
 	  <br>
           <div id="tweet_count"></div>
+          <div id="tweet_live"></div>
         </div>	
         <input name="tweet_submit_button" type="submit">                        
       </form>
@@ -120,10 +131,71 @@ class MainHandler(tornado.web.RequestHandler):
             self.write(t.generate(tweet_senti="0", hashtag_senti="0"))
 
 
+# the typing sessions of the clients, by session id, the least recently used dropped first
+TYPING_SESSIONS = OrderedDict()
+MAX_TYPING_SESSIONS = 1000
+
+class LiveHandler(tornado.web.RequestHandler):
+    """
+    score of the tweet being typed, on each keyup
+    """
+    def get(self):
+        session_id = self.get_argument("session")
+        tweet = self.get_argument("tweet", default="")
+
+        session = TYPING_SESSIONS.pop(session_id, None)
+        if session is None:
+            session = TypingSession()
+            if len(TYPING_SESSIONS) >= MAX_TYPING_SESSIONS:
+                TYPING_SESSIONS.popitem(last = False)
+        TYPING_SESSIONS[session_id] = session
+
+        score = session.score(tweet)
+        self.write("" if score is None else str(score))
+
+
+class ExplainHandler(tornado.web.RequestHandler):
+    """
+    the score of the tweet and how much each word contributes to it, as JSON, 
+    by the default model or the one named by the `model` argument(see `ModelsHandler`)
+    """
+    def get(self):
+        tweet = self.get_argument("tweet", default="")
+        model = self.get_argument("model", default=None)
+
+        if model is None:
+            score, word_deltas = explain(tweet)
+        elif model in REGISTRY.names():
+            score, word_deltas = REGISTRY.get(model).explain(tweet)
+        else:
+            raise tornado.web.HTTPError(404)
+
+        self.write({"score": (None if score is None else float(score)),
+                    "words": [[word, float(delta)] for word, delta in word_deltas]})
+
+
+class ModelsHandler(tornado.web.RequestHandler):
+    """
+    the models that can be named, and the memory and load time of the loaded ones, as JSON
+    """
+    def get(self):
+        self.write({"models": REGISTRY.names(),
+                    "loaded": [{"name": p.name, "bytes": p.nbytes, "load_time": p.load_time}
+                               for p in REGISTRY.loaded()]})
+
+
 def main():
-    application = tornado.web.Application([(r"/", MainHandler)])
+    application = tornado.web.Application([(r"/", MainHandler),
+                                           (r"/live", LiveHandler),
+                                           (r"/explain", ExplainHandler),
+                                           (r"/models", ModelsHandler)])
     http_server = tornado.httpserver.HTTPServer(application)
     port = int(os.environ.get("PORT", 5000))
+    print thread_budget.describe()
+
+    # the model loaded before the first request
+    warm_up()
+
     http_server.listen(port)
     tornado.ioloop.IOLoop.instance().start()
 